@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import threading
+from flask import Flask, Response, abort, jsonify, request
+from config import Config
+from utils import db, init
+from utils.metrics import CONTENT_TYPE, registry
+
+logger = logging.getLogger(__name__)
+
+class WebhookRunner:
+    """Runs the bot's Application on one long-lived event loop for all HTTP requests"""
+
+    def __init__(self, airdrop_bot):
+        self.airdrop_bot = airdrop_bot
+        self.application = airdrop_bot.application
+        from telegram import Update
+        self.update_class = Update
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the loop thread and wait until the Application accepts updates"""
+        self._thread = threading.Thread(target=self._run_loop, name="bot-loop", daemon=True)
+        self._thread.start()
+        self.ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._startup())
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _startup(self):
+        application = self.application
+        await application.initialize()
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        if Config.WEBHOOK_URL:
+            await application.bot.set_webhook(
+                url=Config.WEBHOOK_URL + Config.WEBHOOK_PATH,
+                secret_token=Config.WEBHOOK_SECRET or None,
+                allowed_updates=self.update_class.ALL_TYPES
+            )
+        logger.info("Webhook mode ready")
+
+    async def _shutdown(self):
+        application = self.application
+        await application.stop()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await application.shutdown()
+
+    def stop(self):
+        """Stop the Application and the loop thread"""
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        db.shutdown()
+
+    def submit(self, data: dict):
+        """Hand a decoded update to the Application without waiting for it to be processed"""
+        update = self.update_class.de_json(data, self.application.bot)
+        self.loop.call_soon_threadsafe(self.application.update_queue.put_nowait, update)
+
+    def queue_size(self) -> int:
+        return self.application.update_queue.qsize()
+
+def create_app(airdrop_bot=None) -> Flask:
+    """Build the Flask app serving Telegram webhooks and a health check"""
+    init()
+    if airdrop_bot is None:
+        from bot import AirdropBot
+        from utils.update_processor import UserOrderedUpdateProcessor
+        airdrop_bot = AirdropBot(update_processor=UserOrderedUpdateProcessor(Config.MAX_CONCURRENT_UPDATES))
+
+    runner = WebhookRunner(airdrop_bot)
+    runner.start()
+
+    app = Flask(__name__)
+    app.config["WEBHOOK_RUNNER"] = runner
+
+    @app.post(Config.WEBHOOK_PATH)
+    def webhook():
+        if Config.WEBHOOK_SECRET and \
+                request.headers.get("X-Telegram-Bot-Api-Secret-Token") != Config.WEBHOOK_SECRET:
+            abort(403)
+        data = request.get_json(silent=True)
+        if not data:
+            abort(400)
+        runner.submit(data)
+        return "", 200
+
+    @app.get("/health")
+    def health():
+        if not runner.ready.is_set():
+            return jsonify(status="starting"), 503
+        return jsonify(
+            status="ok",
+            update_queue=runner.queue_size(),
+            catalog_version=db.catalog.version,
+            pending_reminders=len(airdrop_bot.scheduler)
+        )
+
+    @app.get("/metrics")
+    def metrics():
+        if not Config.METRICS_ENABLED:
+            abort(404)
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    return app
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    create_app().run(host=Config.FLASK_HOST, port=Config.FLASK_PORT, threaded=True)
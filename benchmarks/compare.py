@@ -0,0 +1,32 @@
+"""Compare two benchmark reports: python -m benchmarks.compare baseline.json current.json"""
+import argparse
+import json
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative p50 slowdown reported as a regression (default 0.10)')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+    with open(args.current) as f:
+        current = json.load(f)['results']
+
+    regressions = 0
+    print(f"{'benchmark':<24}{'base p50':>12}{'new p50':>12}{'change':>10}")
+    for result in current:
+        base = baseline.get(result['name'])
+        if base is None or not base['p50_us']:
+            continue
+        change = (result['p50_us'] - base['p50_us']) / base['p50_us']
+        flag = '  REGRESSION' if change > args.threshold else ''
+        regressions += bool(flag)
+        print(f"{result['name']:<24}{base['p50_us']:>12}{result['p50_us']:>12}{change:>+10.1%}{flag}")
+
+    raise SystemExit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Import-time budget check: python -m benchmarks.import_time [--budget utils=200]
+
+Imports each module in a fresh interpreter with -X importtime, from an empty
+working directory, and fails (exit status 1) if the median cumulative import
+time exceeds its budget or if the import created any files.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds; bot, app and sharding pull in telegram and flask
+BUDGETS_MS = {
+    'config': 100,
+    'utils': 250,
+    'app': 600,
+    'sharding': 600,
+    'bot': 1500
+}
+
+def measure_once(module: str, cwd: str) -> float:
+    """Return the cumulative import time of module in milliseconds"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    for line in reversed(result.stderr.splitlines()):
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module and parts[2].startswith(' ' + module):
+            return int(parts[1]) / 1000
+    raise RuntimeError(f'no importtime line for {module}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', default=list(BUDGETS_MS))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', action='append', default=[], metavar='MODULE=MS')
+    parser.add_argument('--skip-missing', action='store_true',
+                        help='skip modules whose dependencies are not installed instead of failing')
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS_MS)
+    for item in args.budget:
+        module, ms = item.split('=', 1)
+        budgets[module] = float(ms)
+
+    failures = 0
+    for module in args.modules:
+        with tempfile.TemporaryDirectory(prefix='import-time-') as cwd:
+            try:
+                timings = [measure_once(module, cwd) for _ in range(args.runs)]
+            except RuntimeError as e:
+                if args.skip_missing and 'ModuleNotFoundError' in str(e):
+                    print(f'{module:<10} skipped: {e}')
+                    continue
+                print(f'{module:<10} FAILED to import: {e}')
+                failures += 1
+                continue
+            created = sorted(os.listdir(cwd))
+
+        median = statistics.median(timings)
+        budget = budgets.get(module)
+        status = 'ok'
+        if budget is not None and median > budget:
+            status = f'OVER BUDGET ({budget:g} ms)'
+            failures += 1
+        if created:
+            status += f', import created {created}'
+            failures += 1
+        print(f'{module:<10} {median:8.1f} ms  {status}')
+
+    raise SystemExit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
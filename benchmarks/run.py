@@ -0,0 +1,155 @@
+"""Micro-benchmarks for the storage, pagination and formatting hot paths
+
+    python -m benchmarks.run --preset small --output results.json
+    python -m benchmarks.run --catalog 100000 --users 1000000 --backend sqlite
+
+Results are printed as a table and written as JSON for benchmarks.compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from config import Config
+from benchmarks.synthetic import write_catalog, write_users
+
+PRESETS = {
+    'small': {'catalog': 1000, 'users': 10000},
+    'large': {'catalog': 100000, 'users': 1000000}
+}
+
+def point_config_at(data_dir: str, backend: str):
+    """Redirect every data path to a scratch directory before utils is imported"""
+    Config.DATA_DIR = data_dir
+    Config.ALLDROPS_FILE = os.path.join(data_dir, "alldrops.json")
+    Config.BANNERS_DIR = os.path.join(data_dir, "AirdropBanners")
+    Config.USER_DROPS_DIR = os.path.join(data_dir, "UserDrops")
+    Config.REMINDERS_DIR = os.path.join(data_dir, "Reminders")
+    Config.PENDING_REMINDERS_FILE = os.path.join(Config.REMINDERS_DIR, "pending.jsonl")
+    Config.USERS_FILE = os.path.join(data_dir, "users.jsonl")
+    Config.BROADCASTS_DIR = os.path.join(data_dir, "Broadcasts")
+    Config.SQLITE_PATH = os.path.join(data_dir, "airdrop_hunter.db")
+    Config.JOURNAL_FILE = os.path.join(data_dir, "user_journal.log")
+    Config.STATUS_STATE_FILE = os.path.join(data_dir, "status_state.json")
+    Config.STORAGE_BACKEND = backend
+
+def peak_rss_kb() -> int:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+def bench(name: str, func, args_list: list) -> dict:
+    """Time func(*args) once per entry in args_list"""
+    timings = []
+    perf = time.perf_counter_ns
+    for args in args_list:
+        start = perf()
+        func(*args)
+        timings.append(perf() - start)
+    timings.sort()
+    total = sum(timings)
+    return {
+        'name': name,
+        'iterations': len(timings),
+        'ops_per_sec': round(len(timings) / (total / 1e9), 1) if total else None,
+        'mean_us': round(statistics.fmean(timings) / 1000, 3),
+        'p50_us': round(timings[len(timings) // 2] / 1000, 3),
+        'p99_us': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] / 1000, 3)
+    }
+
+def run(catalog_size: int, user_count: int, backend: str, iterations: int, seed: int) -> dict:
+    data_dir = tempfile.mkdtemp(prefix="airdrop-bench-")
+    try:
+        point_config_at(data_dir, backend)
+        os.makedirs(Config.USER_DROPS_DIR)
+        airdrop_ids = write_catalog(Config.ALLDROPS_FILE, catalog_size, seed)
+        usernames = write_users(Config.USER_DROPS_DIR, user_count, airdrop_ids, seed + 1)
+
+        from utils import db, pagination, formatter, init
+        from utils.models import measure_memory_per_airdrop
+        init()
+        if backend == 'sqlite':
+            db.import_json_directories()
+
+        rng = random.Random(seed)
+        results = []
+
+        reload_iterations = max(1, min(20, iterations // 100))
+        results.append(bench('catalog_reload', lambda: db.catalog.refresh(force=True),
+                             [()] * reload_iterations))
+        results.append(bench('load_all_airdrops', db.load_all_airdrops, [()] * iterations))
+        results.append(bench('get_airdrop_by_id', db.get_airdrop_by_id,
+                             [(rng.choice(airdrop_ids),) for _ in range(iterations)]))
+        results.append(bench('load_user_drops', db.load_user_drops,
+                             [(rng.choice(usernames),) for _ in range(iterations)]))
+        results.append(bench('save_user_drop', db.save_user_drop,
+                             [(rng.choice(usernames), rng.choice(airdrop_ids)) for _ in range(iterations)]))
+
+        all_ids = db.catalog.all_ids()
+        pages = max(1, len(all_ids) // Config.AIRDROPS_PER_PAGE)
+        results.append(bench('paginate_airdrops', pagination.paginate_airdrops,
+                             [(all_ids, rng.randint(1, pages)) for _ in range(iterations)]))
+
+        airdrops = [(db.get_airdrop_by_id(rng.choice(airdrop_ids)),) for _ in range(iterations)]
+        results.append(bench('format_airdrop_detail', formatter.format_airdrop_detail, airdrops))
+        results.append(bench('format_airdrop_summary', formatter.format_airdrop_summary, airdrops))
+
+        return {
+            'meta': {
+                'timestamp': time.time(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'backend': backend,
+                'catalog_size': catalog_size,
+                'users': user_count,
+                'iterations': iterations,
+                'seed': seed
+            },
+            'results': results,
+            'memory_per_airdrop_bytes': round(measure_memory_per_airdrop(min(catalog_size, 20000))),
+            'peak_rss_kb': peak_rss_kb()
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def print_table(report: dict):
+    meta = report['meta']
+    print(f"catalog={meta['catalog_size']} users={meta['users']} backend={meta['backend']}", file=sys.stderr)
+    print(f"{'benchmark':<24}{'ops/s':>14}{'p50 us':>12}{'p99 us':>12}", file=sys.stderr)
+    for result in report['results']:
+        print(f"{result['name']:<24}{result['ops_per_sec']:>14}{result['p50_us']:>12}{result['p99_us']:>12}",
+              file=sys.stderr)
+    print(f"memory/airdrop: {report['memory_per_airdrop_bytes']} B   peak RSS: {report['peak_rss_kb']} KB",
+          file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--catalog', type=int, help='number of airdrops (overrides preset)')
+    parser.add_argument('--users', type=int, help='number of users with wishlists (overrides preset)')
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    preset = PRESETS[args.preset]
+    report = run(args.catalog or preset['catalog'], args.users or preset['users'],
+                 args.backend, args.iterations, args.seed)
+    print_table(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Synthetic catalogs and user populations for the benchmarks"""
+import json
+import os
+import random
+from typing import List
+
+CATEGORIES = ['DeFi', 'Layer 2', 'NFT', 'Gaming', 'Infrastructure', 'Social']
+STATUSES = ['active', 'active', 'active', 'hot', 'ending_soon', 'expired']
+DIFFICULTIES = ['Easy', 'Medium', 'Hard']
+WORDS = [
+    'arbitrum', 'optimism', 'zksync', 'starknet', 'layerzero', 'metamask', 'uniswap',
+    'blast', 'scroll', 'linea', 'base', 'celestia', 'eigen', 'jupiter', 'wormhole'
+]
+
+def make_airdrop(i: int, rng: random.Random) -> dict:
+    project = f"{rng.choice(WORDS).title()}{i}"
+    return {
+        'id': f'airdrop_{i:06d}',
+        'title': f'{project} Airdrop',
+        'description': f'Complete tasks to earn {project} tokens. ' + ' '.join(rng.choices(WORDS, k=12)),
+        'category': rng.choice(CATEGORIES),
+        'status': rng.choice(STATUSES),
+        'end_date': f'20{rng.randint(25, 27)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        'reward': f'Up to {rng.randint(10, 10000)} {project[:4].upper()}',
+        'difficulty': rng.choice(DIFFICULTIES),
+        'links': {
+            'website': f'https://{project.lower()}.io',
+            'twitter': f'https://twitter.com/{project.lower()}'
+        },
+        'tasks': [f'{verb} {rng.choice(WORDS)}' for verb in ('Bridge to', 'Swap on', 'Hold')],
+        'banner': f'{project.lower()}_banner.jpg'
+    }
+
+def write_catalog(path: str, count: int, seed: int = 1) -> List[str]:
+    """Write an alldrops.json with count airdrops and return their ids"""
+    rng = random.Random(seed)
+    airdrops = [make_airdrop(i, rng) for i in range(count)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'airdrops': airdrops}, f, separators=(',', ':'))
+    return [airdrop['id'] for airdrop in airdrops]
+
+def write_users(user_drops_dir: str, count: int, airdrop_ids: List[str], seed: int = 2,
+                max_wishlist: int = 10) -> List[str]:
+    """Write count per-user wishlist files and return the usernames"""
+    rng = random.Random(seed)
+    os.makedirs(user_drops_dir, exist_ok=True)
+    usernames = []
+    for i in range(count):
+        username = f'user{i}'
+        wishlist = rng.sample(airdrop_ids, min(len(airdrop_ids), rng.randint(0, max_wishlist)))
+        with open(os.path.join(user_drops_dir, f'{username}.json'), 'w') as f:
+            json.dump({'airdrops': wishlist}, f, separators=(',', ':'))
+        usernames.append(username)
+    return usernames
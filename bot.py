@@ -1,12 +1,31 @@
+import asyncio
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import signal
+import time
+from datetime import date
+from telegram import (
+    Update, InlineKeyboardButton, InlineKeyboardMarkup,
+    InlineQueryResultArticle, InputTextMessageContent, InputMediaPhoto
+)
 from telegram.ext import (
     Application, CommandHandler, CallbackQueryHandler, 
-    MessageHandler, filters, ContextTypes
+    InlineQueryHandler, MessageHandler, filters, ContextTypes
 )
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 from config import Config
-from utils import db, pagination, formatter, file_helper, validator
+from utils import db, pagination, formatter, file_helper, validator, render_cache, init
+from utils.scheduler import ReminderScheduler, compute_due_at
+from utils.router import CallbackRouter
+from utils.broadcast import Broadcaster, resolve_targets
+from utils import metrics
+from utils.profiler import profiler, profiled
+from utils.banners import banner_store
+from utils.watcher import CatalogWatcher
+from utils.status import StatusEngine
+from utils.coalesce import CallbackCoalescer
+from utils.cache import ScreenFingerprints
+from utils.process_lock import try_lock
 
 # Configure logging
 logging.basicConfig(
@@ -15,27 +34,176 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
 class AirdropBot:
-    def __init__(self):
-        self.application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+    def __init__(self, update_processor=None):
+        self.router = CallbackRouter()
+        self.coalescer = CallbackCoalescer()
+        self.screens = ScreenFingerprints()
+        self.update_processor = update_processor
+        self.setup_routes()
+        builder = (
+            Application.builder()
+            .token(Config.TELEGRAM_BOT_TOKEN)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+        )
+        if Config.TELEGRAM_API_BASE_URL:
+            builder = builder.base_url(Config.TELEGRAM_API_BASE_URL)
+        if update_processor is not None:
+            builder = builder.concurrent_updates(update_processor)
+        if Config.METRICS_ENABLED:
+            builder = builder.request(metrics.create_instrumented_request())
+        self.application = builder.build()
+        self.broadcaster = Broadcaster(self.application.bot)
+        # Reminders and broadcasts share one sending budget
+        self.scheduler = ReminderScheduler(self.deliver_reminder, self.discard_reminder, self.broadcaster.bucket)
+        self.loop_lag_task = None
+        self.banner_prewarm_task = None
+        self.catalog_watcher = None
+        self.status_engine = None
+        self.loop = None
+        self.background_jobs_lock = None
         self.setup_handlers()
+        self.setup_metrics()
+    
+    async def post_init(self, application: Application):
+        """Rebuild the reminder queue from storage and start the scheduler"""
+        self.loop = asyncio.get_running_loop()
+        self.scheduler.start()
+        db.catalog.subscribe(self.on_catalog_change)
+        if Config.CATALOG_WATCH:
+            self.catalog_watcher = CatalogWatcher(db.catalog, self.loop)
+            self.catalog_watcher.start()
+        if Config.STATUS_ENGINE:
+            self.status_engine = StatusEngine(db.catalog)
+            self.status_engine.subscribe(self.on_status_transitions)
+            self.status_engine.start()
+        self.schedule_banner_prewarm()
+        if Config.METRICS_ENABLED:
+            self.loop_lag_task = application.create_task(metrics.monitor_loop_lag())
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGUSR2, profiler.start_full, Config.PROFILE_SIGNAL_SECONDS
+            )
+        except (NotImplementedError, AttributeError, RuntimeError):
+            # No SIGUSR2 on Windows, and signal handlers need the main thread
+            pass
+        if not Config.RUN_BACKGROUND_JOBS:
+            return
+        # Held until exit, so sibling workers leave reminders and broadcasts to this one
+        self.background_jobs_lock = try_lock(Config.BACKGROUND_JOBS_LOCK)
+        if self.background_jobs_lock is None:
+            logger.info("Another process runs the background jobs")
+            return
+        pending = await db.load_pending_reminders_async()
+        self.scheduler.load(pending)
+        logger.info(f"Reminder scheduler started with {len(pending)} pending reminders")
+        application.create_task(self.broadcaster.resume_all())
+    
+    async def post_shutdown(self, application: Application):
+        """Stop the reminder scheduler and flush buffered writes"""
+        if self.loop_lag_task is not None:
+            self.loop_lag_task.cancel()
+        if self.catalog_watcher is not None:
+            # The watcher may be waiting on this loop to apply a reload, so stop it from a thread
+            await asyncio.get_running_loop().run_in_executor(None, self.catalog_watcher.stop)
+        if self.status_engine is not None:
+            await self.status_engine.stop()
+        db.catalog.unsubscribe(self.on_catalog_change)
+        await self.scheduler.stop()
+        await db.flush_async()
+        if self.background_jobs_lock is not None:
+            self.background_jobs_lock.close()
+            self.background_jobs_lock = None
+    
+    def on_catalog_change(self, change):
+        """Catalog subscriber: refresh derived state after a reload"""
+        if change and self.loop is not None:
+            self.loop.call_soon_threadsafe(self.schedule_banner_prewarm)
+    
+    # Cached screens that list airdrops by status or date rather than showing one airdrop
+    LIST_VIEWS = ("all_drops", "hot_drops", "category", "categories", "ending_soon", "my_drops")
+    
+    def on_status_transitions(self, transitions):
+        """Status engine subscriber: drop only the cached screens the new statuses affect"""
+        airdrop_ids = {airdrop_id for airdrop_id, _, _ in transitions}
+        list_views = self.LIST_VIEWS
+        
+        def affected(key):
+            if key[0] in list_views:
+                return True
+            return key[0] in ("detail", "inline") and key[1] in airdrop_ids
+        
+        evicted = render_cache.evict_views(affected)
+        logger.info(f"{len(transitions)} status transitions, {evicted} cached screens dropped")
     
     def setup_handlers(self):
         """Setup all bot handlers"""
+        instrument = self.instrument
+        
         # Command handlers
-        self.application.add_handler(CommandHandler("start", self.start_command))
-        self.application.add_handler(CommandHandler("help", self.help_command))
+        self.application.add_handler(CommandHandler("start", instrument("command:start", self.start_command)))
+        self.application.add_handler(CommandHandler("help", instrument("command:help", self.help_command)))
+        self.application.add_handler(CommandHandler("search", instrument("command:search", self.search_command)))
+        self.application.add_handler(CommandHandler("broadcast", instrument("command:broadcast", self.broadcast_command)))
+        self.application.add_handler(CommandHandler("profile", self.profile_command))
+        
+        # Inline mode (@bot query)
+        self.application.add_handler(InlineQueryHandler(instrument("inline_query", self.inline_query)))
         
-        # Callback query handlers
+        # Callback query handlers; timed and profiled per route inside handle_callback
         self.application.add_handler(CallbackQueryHandler(self.handle_callback))
         
         # Message handlers
-        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND,
+                                                    instrument("message", self.handle_message)))
+    
+    @staticmethod
+    def instrument(label: str, handler):
+        """Wrap a handler with latency metrics and the update profiler"""
+        return metrics.timed(label, profiled(label, handler))
+    
+    def setup_metrics(self):
+        """Export cache and queue gauges to the metrics registry"""
+        registry = metrics.registry
+        registry.watch_cache("render", render_cache)
+        registry.watch_cache("search", db.catalog.search_index.cache)
+        registry.watch_cache("callback_tokens", self.router.token_store)
+        registry.watch_cache("sessions", db.sessions)
+        registry.watch_cache("screens", self.screens)
+        registry.gauge("airdrop_bot_screen_edits_saved_total", "Message edits skipped as unchanged or sent as keyboard-only",
+                       lambda: {"skipped": self.screens.skipped, "markup_only": self.screens.markup_only},
+                       ("saving",), "counter")
+        registry.gauge("airdrop_bot_session_cache_bytes", "Approximate memory held by cached user sessions",
+                       lambda: {(): db.sessions.bytes})
+        registry.gauge("airdrop_bot_session_expirations_total", "User sessions dropped after SESSION_TTL idle",
+                       lambda: {(): db.sessions.expirations}, kind="counter")
+        registry.gauge("airdrop_bot_callback_presses_total", "Button presses by outcome: run, merged into an identical "
+                       "in-flight press, or superseded by a newer one",
+                       lambda: {"run": self.coalescer.executed, "merged": self.coalescer.merged,
+                                "superseded": self.coalescer.superseded}, ("outcome",), "counter")
+        registry.gauge("airdrop_bot_update_queue_size", "Updates waiting to be processed",
+                       lambda: {(): self.application.update_queue.qsize()})
+        registry.gauge("airdrop_bot_pending_reminders", "Reminders waiting in the scheduler",
+                       lambda: {(): len(self.scheduler)})
+        registry.gauge("airdrop_bot_catalog_version", "Number of catalog reloads since start",
+                       lambda: {(): db.catalog.version})
+        registry.gauge("airdrop_bot_status_transitions_total", "Airdrop statuses changed by the status engine",
+                       lambda: {(): self.status_engine.transitions if self.status_engine else 0}, kind="counter")
+        registry.gauge("airdrop_bot_catalog_rejected_total", "Catalog files that failed to parse and were skipped",
+                       lambda: {(): db.catalog.rejected}, kind="counter")
+        registry.gauge("airdrop_bot_banner_sends_total", "Banner photos sent, by upload or cached file_id",
+                       lambda: {"upload": banner_store.uploads, "file_id": banner_store.reuses}, ("source",), "counter")
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
         user = update.effective_user
         username = validator.sanitize_username(user.username or str(user.id))
+        await db.register_user_async(username, update.effective_chat.id)
         
         welcome_message = f"🎯 **Welcome to Airdrop Hunter Bot, {user.first_name}!**\n\n" \
                          f"🚀 Discover and manage cryptocurrency airdrops easily!\n\n" \
@@ -59,12 +227,15 @@ class AirdropBot:
         help_text = "🤖 **Airdrop Hunter Bot Help**\n\n" \
                    "**Commands:**\n" \
                    "/start - Start the bot\n" \
-                   "/help - Show this help message\n\n" \
+                   "/help - Show this help message\n" \
+                   "/search <text> - Find airdrops by name, category or task\n\n" \
                    "**Features:**\n" \
                    "🌟 **All Drops** - Browse all available airdrops\n" \
                    "💎 **My Drops** - View your saved airdrops\n" \
                    "⏰ **Reminders** - Manage your airdrop reminders\n" \
-                   "🔥 **Hot Drops** - Check trending airdrops\n\n" \
+                   "🔥 **Hot Drops** - Check trending airdrops\n" \
+                   "🏷️ **Categories** - Browse airdrops by category\n" \
+                   "⌛ **Ending Soon** - Upcoming deadlines first\n\n" \
                    "**How to use:**\n" \
                    "1. Click 'All Drops' to browse airdrops\n" \
                    "2. Click on any airdrop for details\n" \
@@ -80,104 +251,387 @@ class AirdropBot:
             parse_mode=ParseMode.MARKDOWN
         )
     
+    async def broadcast_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /broadcast <all|category:NAME|wishlist:ID> <message> (admins only)"""
+        if update.effective_user.id not in Config.ADMIN_USER_IDS:
+            return
+        
+        if len(context.args or []) < 2:
+            await update.message.reply_text(
+                "Usage: /broadcast <all|category:NAME|wishlist:AIRDROP_ID> <message>"
+            )
+            return
+        
+        target, text = context.args[0], " ".join(context.args[1:])
+        try:
+            targets = await resolve_targets(db, target)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}")
+            return
+        
+        await update.message.reply_text(f"📣 Broadcasting to {len(targets)} users...")
+        
+        async def run():
+            stats = await self.broadcaster.start(text, targets)
+            await update.message.reply_text(
+                f"📣 Broadcast {stats['id']} done: {stats['sent']} sent, {stats['failed']} failed, "
+                f"{stats['retries']} retries in {stats['elapsed']}s ({stats['per_second']} msg/s)"
+            )
+        
+        context.application.create_task(run())
+    
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /profile [seconds]: sample the event loop continuously (admins only)"""
+        if update.effective_user.id not in Config.ADMIN_USER_IDS:
+            return
+        
+        try:
+            seconds = float(context.args[0]) if context.args else Config.PROFILE_SIGNAL_SECONDS
+        except ValueError:
+            await update.message.reply_text("Usage: /profile [seconds]")
+            return
+        
+        if not profiler.start_full(seconds):
+            await update.message.reply_text("⏱ A profile is already being recorded.")
+            return
+        await update.message.reply_text(
+            f"⏱ Profiling for {min(seconds, Config.PROFILE_MAX_SECONDS):g}s, "
+            f"collapsed stacks go to {profiler.directory}"
+        )
+    
+    async def search_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /search command"""
+        query_text = " ".join(context.args or [])
+        
+        if not query_text:
+            await update.message.reply_text(
+                "🔍 Usage: /search <text>\nExample: /search arbitrum",
+                reply_markup=self.get_main_keyboard()
+            )
+            return
+        
+        airdrop_ids = db.catalog.search(query_text, Config.SEARCH_RESULTS_LIMIT)
+        
+        if not airdrop_ids:
+            await update.message.reply_text(
+                "🔍 No airdrops matched your search.\nTry a shorter or different keyword.",
+                reply_markup=self.get_main_keyboard()
+            )
+            return
+        
+        keyboard = []
+        for airdrop in db.catalog.resolve(airdrop_ids):
+            keyboard.append([InlineKeyboardButton(
+                f"🎯 {airdrop['title']}", 
+                callback_data=self.router.encode("airdrop", airdrop['id'])
+            )])
+        keyboard.append([InlineKeyboardButton("🔙 Back to Main", callback_data=self.router.encode("main"))])
+        
+        await update.message.reply_text(
+            f"🔍 **Search Results** ({len(airdrop_ids)})",
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode=ParseMode.MARKDOWN
+        )
+    
+    def render_inline_result(self, airdrop):
+        """Build the inline-mode result for one airdrop"""
+        return InlineQueryResultArticle(
+            id=airdrop['id'],
+            title=airdrop['title'],
+            description=f"{airdrop.get('category', 'General')} · {airdrop.get('reward', 'TBA')}",
+            input_message_content=InputTextMessageContent(
+                formatter.format_airdrop_summary(airdrop),
+                parse_mode=ParseMode.MARKDOWN
+            )
+        )
+    
+    async def inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Answer inline queries with matching airdrops"""
+        query_text = update.inline_query.query
+        catalog_version = db.catalog_version
+        
+        if query_text.strip():
+            airdrop_ids = db.catalog.search(query_text, Config.SEARCH_RESULTS_LIMIT)
+        else:
+            airdrop_ids = db.catalog.ids_by_status('hot')[:Config.SEARCH_RESULTS_LIMIT]
+        
+        results = [
+            render_cache.get_or_render(
+                ("inline", airdrop['id']), catalog_version,
+                lambda airdrop=airdrop: self.render_inline_result(airdrop)
+            )
+            for airdrop in db.catalog.resolve(airdrop_ids)
+        ]
+        
+        await update.inline_query.answer(results, cache_time=Config.INLINE_QUERY_CACHE_TIME)
+    
+    def setup_routes(self):
+        """Register callback routes
+
+        Opcodes are persisted in buttons on users' old messages, so they must
+        never be renumbered or reused.
+        """
+        routes = self.router
+        routes.add("a", "all_drops", lambda query, username, page: self.show_all_drops(query, page),
+                   int, legacy="all_drops_")
+        routes.add("m", "my_drops", self.show_my_drops, int, legacy="my_drops_")
+        routes.add("h", "hot_drops", lambda query, username, page: self.show_hot_drops(query, page),
+                   int, legacy="hot_drops_")
+        routes.add("e", "ending_soon", lambda query, username, page: self.show_ending_soon(query, page),
+                   int, legacy="ending_soon_")
+        routes.add("C", "categories", lambda query, username: self.show_categories(query),
+                   legacy="categories")
+        routes.add("c", "category", lambda query, username, category, page: self.show_category_drops(query, category, page),
+                   str, int)
+        routes.add("d", "airdrop", lambda query, username, airdrop_id: self.show_airdrop_detail(query, airdrop_id, username),
+                   str, legacy="airdrop_")
+        routes.add("w", "wishlist", self.add_to_wishlist, str, legacy="wishlist_")
+        routes.add("x", "remove_wishlist", self.remove_from_wishlist, str, legacy="remove_wishlist_")
+        routes.add("r", "remind", lambda query, username, airdrop_id: self.show_reminder_options(query, airdrop_id),
+                   str, legacy="remind_")
+        routes.add("s", "set_reminder", self.set_reminder, str, str)
+        routes.add("R", "reminders", self.show_reminders, legacy="reminders")
+        routes.add("?", "help", lambda query, username: self.show_help(query), legacy="help")
+        routes.add("f", "refresh", lambda query, username: self.show_main_menu(query), legacy="refresh")
+        routes.add("M", "main", lambda query, username: self.show_main_menu(query), legacy="back_to_main")
+        routes.add_legacy("back_to_drops_", "all_drops")
+        routes.add_legacy("set_reminder_", "set_reminder", self.parse_legacy_reminder)
+    
+    @staticmethod
+    def parse_legacy_reminder(rest: str):
+        """Split old "set_reminder_<airdrop_id>_<option with underscores>" data; ids may contain underscores"""
+        for option in Config.REMINDER_OPTIONS:
+            suffix = "_" + option.replace(" ", "_")
+            if rest.endswith(suffix) and len(rest) > len(suffix):
+                return rest[:-len(suffix)], option
+        return None
+    
     def get_main_keyboard(self):
         """Get main menu keyboard"""
         keyboard = [
             [
-                InlineKeyboardButton("🌟 All Drops", callback_data="all_drops_1"),
-                InlineKeyboardButton("💎 My Drops", callback_data="my_drops_1")
+                InlineKeyboardButton("🌟 All Drops", callback_data=self.router.encode("all_drops", 1)),
+                InlineKeyboardButton("💎 My Drops", callback_data=self.router.encode("my_drops", 1))
+            ],
+            [
+                InlineKeyboardButton("⏰ Reminders", callback_data=self.router.encode("reminders")),
+                InlineKeyboardButton("🔥 Hot Drops", callback_data=self.router.encode("hot_drops", 1))
             ],
             [
-                InlineKeyboardButton("⏰ Reminders", callback_data="reminders"),
-                InlineKeyboardButton("🔥 Hot Drops", callback_data="hot_drops_1")
+                InlineKeyboardButton("🏷️ Categories", callback_data=self.router.encode("categories")),
+                InlineKeyboardButton("⌛ Ending Soon", callback_data=self.router.encode("ending_soon", 1))
             ],
             [
-                InlineKeyboardButton("ℹ️ Help", callback_data="help"),
-                InlineKeyboardButton("🔄 Refresh", callback_data="refresh")
+                InlineKeyboardButton("ℹ️ Help", callback_data=self.router.encode("help")),
+                InlineKeyboardButton("🔄 Refresh", callback_data=self.router.encode("refresh"))
             ]
         ]
         return InlineKeyboardMarkup(keyboard)
     
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle all callback queries"""
-        query = update.callback_query
-        await query.answer()
-        
-        data = query.data
-        user = update.effective_user
-        username = validator.sanitize_username(user.username or str(user.id))
-        
+        capture = profiler.begin()
+        started = time.perf_counter()
+        label = "callback:expired"
+        data = None
         try:
-            if data.startswith("all_drops_"):
-                page = int(data.split("_")[-1])
-                await self.show_all_drops(query, page)
-            
-            elif data.startswith("my_drops_"):
-                page = int(data.split("_")[-1])
-                await self.show_my_drops(query, username, page)
-            
-            elif data.startswith("hot_drops_"):
-                page = int(data.split("_")[-1])
-                await self.show_hot_drops(query, page)
-            
-            elif data.startswith("airdrop_"):
-                airdrop_id = data.replace("airdrop_", "")
-                await self.show_airdrop_detail(query, airdrop_id, username)
-            
-            elif data.startswith("wishlist_"):
-                airdrop_id = data.replace("wishlist_", "")
-                await self.add_to_wishlist(query, username, airdrop_id)
-            
-            elif data.startswith("remove_wishlist_"):
-                airdrop_id = data.replace("remove_wishlist_", "")
-                await self.remove_from_wishlist(query, username, airdrop_id)
-            
-            elif data.startswith("remind_"):
-                airdrop_id = data.replace("remind_", "")
-                await self.show_reminder_options(query, airdrop_id)
+            query = update.callback_query
+            await query.answer()
             
-            elif data.startswith("set_reminder_"):
-                parts = data.split("_", 3)
-                airdrop_id, time_option = parts[2], parts[3]
-                await self.set_reminder(query, username, airdrop_id, time_option)
+            data = query.data
+            user = update.effective_user
+            username = validator.sanitize_username(user.username or str(user.id))
+            await db.register_user_async(username, user.id)
             
-            elif data == "reminders":
-                await self.show_reminders(query, username)
+            route = await self.router.decode_async(data)
             
-            elif data == "help":
-                await self.show_help(query)
+            if route is None:
+                await self.edit_screen(
+                    query,
+                    "⌛ This button has expired. Please start again.",
+                    reply_markup=self.get_main_keyboard()
+                )
+                return
             
-            elif data == "refresh":
-                await self.show_main_menu(query)
+            route, args = route
+            label = "callback:" + route.name
             
-            elif data == "back_to_main":
-                await self.show_main_menu(query)
+            try:
+                handle = lambda: route.handler(query, username, *args)
+                if route.name in self.ACTION_ROUTES:
+                    # Actions on different messages must not race each other or the user's messages
+                    job = lambda: self.run_ordered(user.id, handle)
+                else:
+                    job = handle
+                ran = await self.coalescer.submit(
+                    self.coalesce_key(query), data, job,
+                    latest_wins=route.name not in self.ACTION_ROUTES
+                )
+                if not ran:
+                    label = "callback:coalesced"
             
-            elif data.startswith("back_to_drops_"):
-                page = int(data.split("_")[-1])
-                await self.show_all_drops(query, page)
-        
-        except Exception as e:
-            logger.error(f"Error handling callback {data}: {e}")
-            await query.edit_message_text("❌ An error occurred. Please try again.")
+            except Exception as e:
+                metrics.HANDLER_ERRORS.inc(label)
+                logger.error(f"Error handling callback {data}: {e}")
+                await self.edit_screen(query, "❌ An error occurred. Please try again.")
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.HANDLER_SECONDS.observe(label, elapsed)
+            if capture is not None or profiler.is_slow(elapsed):
+                profiler.finish(capture, label, elapsed)
     
-    async def show_all_drops(self, query, page: int = 1):
-        """Show all airdrops with pagination"""
-        all_data = db.load_all_airdrops()
-        airdrops = all_data.get("airdrops", [])
+    # Routes that change user data; every press of these runs, the rest only render a screen
+    ACTION_ROUTES = frozenset(("wishlist", "remove_wishlist", "set_reminder"))
+    
+    async def run_ordered(self, user_id: int, job):
+        """Run job in turn with the user's other actions and messages"""
+        if self.update_processor is None:
+            # Without concurrent updates every update already runs one at a time
+            return await job()
+        async with self.update_processor.user_lock(user_id):
+            return await job()
+    
+    @staticmethod
+    def coalesce_key(query):
+        """Identify the message a button press belongs to"""
+        if query.message is not None:
+            return query.from_user.id, query.message.chat_id, query.message.message_id
+        return query.from_user.id, query.inline_message_id
+    
+    @staticmethod
+    def screen_key(query):
+        """Identify the message a callback's edits apply to"""
+        if query.message is not None:
+            return query.message.chat_id, query.message.message_id
+        return query.inline_message_id
+    
+    async def apply_edit(self, query, fingerprint: tuple, edit, edit_markup):
+        """Send only what differs from what the callback's message already shows"""
+        key = self.screen_key(query)
+        plan = self.screens.plan(key, fingerprint, query.message)
+        if plan == ScreenFingerprints.SKIP:
+            return
+        try:
+            if plan == ScreenFingerprints.MARKUP:
+                edited = await edit_markup()
+            else:
+                edited = await edit()
+        except BadRequest as e:
+            # The message may have been edited before we started tracking it
+            if "not modified" not in str(e).lower():
+                self.screens.pop(key)
+                raise
+            edited = query.message
+        self.screens.record(key, fingerprint, edited)
+    
+    async def edit_screen(self, query, text: str, reply_markup=None, parse_mode=None):
+        """Show a text screen in place of the callback's message, skipping edits that change nothing"""
+        message = query.message
+        fingerprint = self.screens.fingerprint("text", text, parse_mode, reply_markup)
+        if message is None or not message.photo:
+            await self.apply_edit(
+                query, fingerprint,
+                lambda: query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode),
+                lambda: query.edit_message_reply_markup(reply_markup=reply_markup)
+            )
+            return
         
-        if not airdrops:
-            await query.edit_message_text(
-                "📭 No airdrops available at the moment.\nCheck back later!",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Back to Main", callback_data="back_to_main")
-                ]])
+        # A photo message cannot be edited into text, so replace it
+        sent = await message.chat.send_message(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        self.screens.pop(self.screen_key(query))
+        self.screens.record((sent.chat_id, sent.message_id), fingerprint, sent)
+        try:
+            await message.delete()
+        except BadRequest:
+            pass
+    
+    async def show_banner_screen(self, query, banner: tuple, caption: str, reply_markup):
+        """Show a photo screen, uploading the banner only the first time it is sent"""
+        digest, upload_path = banner
+        message = query.message
+        cached = banner_store.file_id(digest)
+        key = self.screen_key(query)
+        fingerprint = self.screens.fingerprint("caption", caption, ParseMode.MARKDOWN, reply_markup)
+        
+        if cached and message.photo and message.photo[-1].file_unique_id == cached[1]:
+            # Same picture already on screen: only the caption and buttons change
+            await self.apply_edit(
+                query, fingerprint,
+                lambda: query.edit_message_caption(caption, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN),
+                lambda: query.edit_message_reply_markup(reply_markup=reply_markup)
             )
             return
         
-        page_airdrops, page_info = pagination.paginate_airdrops(airdrops, page)
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            if cached:
+                media = cached[0]
+            else:
+                media = await loop.run_in_executor(None, _read_bytes, upload_path)
+            try:
+                if message.photo:
+                    sent = await query.edit_message_media(
+                        InputMediaPhoto(media, caption=caption, parse_mode=ParseMode.MARKDOWN),
+                        reply_markup=reply_markup
+                    )
+                    self.screens.record(key, fingerprint, sent)
+                else:
+                    sent = await message.chat.send_photo(
+                        media, caption=caption, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN
+                    )
+                    self.screens.pop(key)
+                    self.screens.record((sent.chat_id, sent.message_id), fingerprint, sent)
+                    try:
+                        await message.delete()
+                    except BadRequest:
+                        pass
+            except BadRequest:
+                if not cached or attempt:
+                    raise
+                # The stored file_id stopped working; upload again
+                await loop.run_in_executor(None, banner_store.forget, digest)
+                cached = None
+                continue
+            break
+        
+        if cached:
+            banner_store.reuses += 1
+        else:
+            banner_store.uploads += 1
+            if getattr(sent, "photo", None):
+                photo = sent.photo[-1]
+                await loop.run_in_executor(
+                    None, banner_store.remember, digest, photo.file_id, photo.file_unique_id
+                )
+    
+    def schedule_banner_prewarm(self):
+        """Prepare banners in the background when the catalog changed since the last pass"""
+        if self.banner_prewarm_task is not None and not self.banner_prewarm_task.done():
+            return
+        catalog_version = db.catalog_version
+        if banner_store.prewarmed_version == catalog_version:
+            return
+        self.banner_prewarm_task = asyncio.get_running_loop().run_in_executor(
+            None, lambda: banner_store.prewarm(
+                # Stream the records: get_airdrops() would materialise and keep the whole catalog
+                (airdrop.get('banner') for _, airdrop in db.catalog.items()), catalog_version
+            )
+        )
+    
+    async def get_banner(self, banner_filename: str):
+        """Return a prepared (digest, path) for a banner, preparing it now if the pre-warm has not"""
+        if not banner_filename:
+            return None
+        if banner_store.is_known(banner_filename):
+            return banner_store.get(banner_filename)
+        return await asyncio.get_running_loop().run_in_executor(None, banner_store.prepare, banner_filename)
+    
+    def render_airdrop_list(self, airdrop_ids: list, page: int, title: str, button_emoji: str, page_callback):
+        """Build the text and keyboard for one page of an airdrop ID list"""
+        page_ids, page_info = pagination.paginate_airdrops(airdrop_ids, page)
+        page_airdrops = db.catalog.resolve(page_ids)
         
-        message = "🌟 **All Available Airdrops**\n\n"
+        message = f"{title}\n\n"
         message += formatter.format_page_info(page_info) + "\n\n"
         
         keyboard = []
@@ -185,169 +639,252 @@ class AirdropBot:
         # Add airdrop buttons
         for airdrop in page_airdrops:
             keyboard.append([InlineKeyboardButton(
-                f"🎯 {airdrop['title']}", 
-                callback_data=f"airdrop_{airdrop['id']}"
+                f"{button_emoji} {airdrop['title']}", 
+                callback_data=self.router.encode("airdrop", airdrop['id'])
             )])
         
         # Add navigation buttons
         nav_buttons = []
         if page_info['has_prev']:
-            nav_buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"all_drops_{page_info['prev_page']}"))
+            nav_buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=page_callback(page_info['prev_page'])))
         if page_info['has_next']:
-            nav_buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"all_drops_{page_info['next_page']}"))
+            nav_buttons.append(InlineKeyboardButton("Next ➡️", callback_data=page_callback(page_info['next_page'])))
         
         if nav_buttons:
             keyboard.append(nav_buttons)
         
         # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Back to Main", callback_data="back_to_main")])
+        keyboard.append([InlineKeyboardButton("🔙 Back to Main", callback_data=self.router.encode("main"))])
         
-        await query.edit_message_text(
-            message,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode=ParseMode.MARKDOWN
-        )
+        return message, InlineKeyboardMarkup(keyboard)
     
-    async def show_airdrop_detail(self, query, airdrop_id: str, username: str):
-        """Show detailed airdrop information"""
-        airdrop = db.get_airdrop_by_id(airdrop_id)
+    async def show_all_drops(self, query, page: int = 1):
+        """Show all airdrops with pagination"""
+        catalog_version = db.catalog_version
+        airdrop_ids = db.catalog.all_ids()
         
-        if not airdrop:
-            await query.edit_message_text("❌ Airdrop not found!")
+        if not airdrop_ids:
+            await self.edit_screen(
+                query,
+                "📭 No airdrops available at the moment.\nCheck back later!",
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🔙 Back to Main", callback_data=self.router.encode("main"))
+                ]])
+            )
             return
         
-        message = formatter.format_airdrop_detail(airdrop)
+        message, keyboard = render_cache.get_or_render(
+            ("all_drops", page), catalog_version,
+            lambda: self.render_airdrop_list(airdrop_ids, page, "🌟 **All Available Airdrops**", "🎯", lambda p: self.router.encode("all_drops", p))
+        )
         
-        # Check if already in wishlist
-        user_drops = db.load_user_drops(username)
-        is_wishlisted = airdrop_id in user_drops
+        await self.edit_screen(
+            query,
+            message,
+            reply_markup=keyboard,
+            parse_mode=ParseMode.MARKDOWN
+        )
+    
+    def render_airdrop_detail(self, airdrop: dict, is_wishlisted: bool):
+        """Build the text and keyboard for an airdrop detail screen"""
+        airdrop_id = airdrop['id']
+        message = formatter.format_airdrop_detail(airdrop)
         
         keyboard = []
         
         # Action buttons
         action_buttons = []
         if is_wishlisted:
-            action_buttons.append(InlineKeyboardButton("💔 Remove from Wishlist", callback_data=f"remove_wishlist_{airdrop_id}"))
+            action_buttons.append(InlineKeyboardButton("💔 Remove from Wishlist", callback_data=self.router.encode("remove_wishlist", airdrop_id)))
         else:
-            action_buttons.append(InlineKeyboardButton("💎 Add to Wishlist", callback_data=f"wishlist_{airdrop_id}"))
+            action_buttons.append(InlineKeyboardButton("💎 Add to Wishlist", callback_data=self.router.encode("wishlist", airdrop_id)))
         
-        action_buttons.append(InlineKeyboardButton("⏰ Set Reminder", callback_data=f"remind_{airdrop_id}"))
+        action_buttons.append(InlineKeyboardButton("⏰ Set Reminder", callback_data=self.router.encode("remind", airdrop_id)))
         keyboard.append(action_buttons)
         
         # Back button
-        keyboard.append([InlineKeyboardButton("🔙 Back to All Drops", callback_data="all_drops_1")])
+        keyboard.append([InlineKeyboardButton("🔙 Back to All Drops", callback_data=self.router.encode("all_drops", 1))])
         
-        await query.edit_message_text(
+        return message, InlineKeyboardMarkup(keyboard)
+    
+    async def show_airdrop_detail(self, query, airdrop_id: str, username: str):
+        """Show detailed airdrop information"""
+        catalog_version = db.catalog_version
+        airdrop = db.get_airdrop_by_id(airdrop_id)
+        
+        if not airdrop:
+            await self.edit_screen(query, "❌ Airdrop not found!")
+            return
+        
+        # Check if already in wishlist
+        is_wishlisted = await db.is_wishlisted_async(username, airdrop_id)
+        
+        message, keyboard = render_cache.get_or_render(
+            ("detail", airdrop_id, is_wishlisted), catalog_version,
+            lambda: self.render_airdrop_detail(airdrop, is_wishlisted)
+        )
+        
+        self.schedule_banner_prewarm()
+        # Inline-mode messages (query.message is None) stay text only
+        if query.message is not None and len(message) <= Config.CAPTION_MAX_LENGTH:
+            banner = await self.get_banner(airdrop.get('banner'))
+            if banner:
+                await self.show_banner_screen(query, banner, message, keyboard)
+                return
+        
+        await self.edit_screen(
+            query,
             message,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=keyboard,
             parse_mode=ParseMode.MARKDOWN
         )
     
     async def show_my_drops(self, query, username: str, page: int = 1):
         """Show user's saved airdrops"""
-        user_drop_ids = db.load_user_drops(username)
+        user_drop_ids = await db.load_user_drops_async(username)
         
         if not user_drop_ids:
-            await query.edit_message_text(
+            await self.edit_screen(
+                query,
                 "💎 **My Drops**\n\n📭 Your wishlist is empty!\n\nBrowse 'All Drops' to add some airdrops to your collection.",
                 reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🌟 Browse All Drops", callback_data="all_drops_1")],
-                    [InlineKeyboardButton("🔙 Back to Main", callback_data="back_to_main")]
+                    [InlineKeyboardButton("🌟 Browse All Drops", callback_data=self.router.encode("all_drops", 1))],
+                    [InlineKeyboardButton("🔙 Back to Main", callback_data=self.router.encode("main"))]
                 ]),
                 parse_mode=ParseMode.MARKDOWN
             )
             return
         
-        # Get full airdrop data
-        all_data = db.load_all_airdrops()
-        all_airdrops = {airdrop['id']: airdrop for airdrop in all_data.get("airdrops", [])}
+        catalog_version = db.catalog_version
         
-        user_airdrops = []
-        for airdrop_id in user_drop_ids:
-            if airdrop_id in all_airdrops:
-                user_airdrops.append(all_airdrops[airdrop_id])
+        def render():
+            # Skip saved airdrops that are no longer in the catalog
+            known_ids = [airdrop_id for airdrop_id in user_drop_ids if db.get_airdrop_by_id(airdrop_id)]
+            return self.render_airdrop_list(known_ids, page, "💎 **My Saved Airdrops**", "🎯", lambda p: self.router.encode("my_drops", p))
         
-        page_airdrops, page_info = pagination.paginate_airdrops(user_airdrops, page)
-        
-        message = "💎 **My Saved Airdrops**\n\n"
-        message += formatter.format_page_info(page_info) + "\n\n"
-        
-        keyboard = []
-        
-        # Add airdrop buttons
-        for airdrop in page_airdrops:
-            keyboard.append([InlineKeyboardButton(
-                f"🎯 {airdrop['title']}", 
-                callback_data=f"airdrop_{airdrop['id']}"
-            )])
-        
-        # Add navigation buttons
-        nav_buttons = []
-        if page_info['has_prev']:
-            nav_buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"my_drops_{page_info['prev_page']}"))
-        if page_info['has_next']:
-            nav_buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"my_drops_{page_info['next_page']}"))
-        
-        if nav_buttons:
-            keyboard.append(nav_buttons)
-        
-        # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Back to Main", callback_data="back_to_main")])
+        # Keyed by the wishlist itself so users with the same list share entries
+        message, keyboard = render_cache.get_or_render(
+            ("my_drops", tuple(user_drop_ids), page), catalog_version, render
+        )
         
-        await query.edit_message_text(
+        await self.edit_screen(
+            query,
             message,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=keyboard,
             parse_mode=ParseMode.MARKDOWN
         )
 
     async def show_hot_drops(self, query, page: int = 1):
         """Show hot/trending airdrops"""
-        all_data = db.load_all_airdrops()
-        all_airdrops = all_data.get("airdrops", [])
+        catalog_version = db.catalog_version
+        hot_ids = db.catalog.ids_by_status('hot')
         
-        # Filter for hot airdrops
-        hot_airdrops = [airdrop for airdrop in all_airdrops if airdrop.get('status') == 'hot']
-        
-        if not hot_airdrops:
-            await query.edit_message_text(
+        if not hot_ids:
+            await self.edit_screen(
+                query,
                 "🔥 **Hot Drops**\n\n🚫 No hot airdrops at the moment.\nCheck back later for trending opportunities!",
                 reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Back to Main", callback_data="back_to_main")
+                    InlineKeyboardButton("🔙 Back to Main", callback_data=self.router.encode("main"))
                 ]]),
                 parse_mode=ParseMode.MARKDOWN
             )
             return
         
-        page_airdrops, page_info = pagination.paginate_airdrops(hot_airdrops, page)
-        
-        message = "🔥 **Hot Trending Airdrops**\n\n"
-        message += formatter.format_page_info(page_info) + "\n\n"
+        message, keyboard = render_cache.get_or_render(
+            ("hot_drops", page), catalog_version,
+            lambda: self.render_airdrop_list(hot_ids, page, "🔥 **Hot Trending Airdrops**", "🔥", lambda p: self.router.encode("hot_drops", p))
+        )
         
+        await self.edit_screen(
+            query,
+            message,
+            reply_markup=keyboard,
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    def render_categories(self):
+        """Build the category picker"""
         keyboard = []
-        
-        # Add airdrop buttons
-        for airdrop in page_airdrops:
+        for category in db.catalog.categories():
+            count = len(db.catalog.ids_by_category(category))
             keyboard.append([InlineKeyboardButton(
-                f"🔥 {airdrop['title']}", 
-                callback_data=f"airdrop_{airdrop['id']}"
+                f"🏷️ {category} ({count})",
+                callback_data=self.router.encode("category", category, 1)
             )])
+        keyboard.append([InlineKeyboardButton("🔙 Back to Main", callback_data=self.router.encode("main"))])
         
-        # Add navigation buttons
-        nav_buttons = []
-        if page_info['has_prev']:
-            nav_buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"hot_drops_{page_info['prev_page']}"))
-        if page_info['has_next']:
-            nav_buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"hot_drops_{page_info['next_page']}"))
+        return "🏷️ **Browse by Category**\n\nChoose a category:", InlineKeyboardMarkup(keyboard)
+
+    async def show_categories(self, query):
+        """Show the list of categories"""
+        message, keyboard = render_cache.get_or_render(
+            ("categories",), db.catalog_version, self.render_categories
+        )
         
-        if nav_buttons:
-            keyboard.append(nav_buttons)
+        await self.edit_screen(
+            query,
+            message,
+            reply_markup=keyboard,
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    async def show_category_drops(self, query, category: str, page: int = 1):
+        """Show airdrops in one category"""
+        catalog_version = db.catalog_version
+        category_ids = db.catalog.ids_by_category(category)
+        
+        if not category_ids:
+            await self.edit_screen(
+                query,
+                f"🏷️ **{category}**\n\n🚫 No airdrops in this category right now.",
+                reply_markup=InlineKeyboardMarkup([
+                    [InlineKeyboardButton("🏷️ All Categories", callback_data=self.router.encode("categories"))],
+                    [InlineKeyboardButton("🔙 Back to Main", callback_data=self.router.encode("main"))]
+                ]),
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
         
-        # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Back to Main", callback_data="back_to_main")])
+        message, keyboard = render_cache.get_or_render(
+            ("category", category, page), catalog_version,
+            lambda: self.render_airdrop_list(
+                category_ids, page, f"🏷️ **{category} Airdrops**", "🎯", lambda p: self.router.encode("category", category, p)
+            )
+        )
         
-        await query.edit_message_text(
+        await self.edit_screen(
+            query,
             message,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=keyboard,
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    async def show_ending_soon(self, query, page: int = 1):
+        """Show airdrops that have not ended yet, soonest deadline first"""
+        catalog_version = db.catalog_version
+        today = date.today().isoformat()
+        ending_ids = db.catalog.ids_ending_between(start=today)
+        
+        if not ending_ids:
+            await self.edit_screen(
+                query,
+                "⌛ **Ending Soon**\n\n🚫 No upcoming deadlines.",
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🔙 Back to Main", callback_data=self.router.encode("main"))
+                ]]),
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+        
+        message, keyboard = render_cache.get_or_render(
+            ("ending_soon", today, page), catalog_version,
+            lambda: self.render_airdrop_list(ending_ids, page, "⌛ **Ending Soon**", "⌛", lambda p: self.router.encode("ending_soon", p))
+        )
+        
+        await self.edit_screen(
+            query,
+            message,
+            reply_markup=keyboard,
             parse_mode=ParseMode.MARKDOWN
         )
 
@@ -359,7 +896,7 @@ class AirdropBot:
             await query.answer("❌ Airdrop not found!", show_alert=True)
             return
         
-        db.save_user_drop(username, airdrop_id)
+        await db.save_user_drop_async(username, airdrop_id)
         await query.answer(f"💎 Added '{airdrop['title']}' to your wishlist!", show_alert=True)
         
         # Refresh the airdrop detail view
@@ -373,7 +910,7 @@ class AirdropBot:
             await query.answer("❌ Airdrop not found!", show_alert=True)
             return
         
-        db.remove_user_drop(username, airdrop_id)
+        await db.remove_user_drop_async(username, airdrop_id)
         await query.answer(f"💔 Removed '{airdrop['title']}' from your wishlist!", show_alert=True)
         
         # Refresh the airdrop detail view
@@ -396,19 +933,20 @@ class AirdropBot:
         for option_text, minutes in Config.REMINDER_OPTIONS.items():
             keyboard.append([InlineKeyboardButton(
                 f"⏰ {option_text}", 
-                callback_data=f"set_reminder_{airdrop_id}_{option_text.replace(' ', '_')}"
+                callback_data=self.router.encode("set_reminder", airdrop_id, option_text)
             )])
         
         # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Back", callback_data=f"airdrop_{airdrop_id}")])
+        keyboard.append([InlineKeyboardButton("🔙 Back", callback_data=self.router.encode("airdrop", airdrop_id))])
         
-        await query.edit_message_text(
+        await self.edit_screen(
+            query,
             message,
             reply_markup=InlineKeyboardMarkup(keyboard),
             parse_mode=ParseMode.MARKDOWN
         )
 
-    async def set_reminder(self, query, username: str, airdrop_id: str, time_option: str):
+    async def set_reminder(self, query, username: str, airdrop_id: str, time_readable: str):
         """Set reminder for airdrop"""
         airdrop = db.get_airdrop_by_id(airdrop_id)
         
@@ -416,11 +954,16 @@ class AirdropBot:
             await query.answer("❌ Airdrop not found!", show_alert=True)
             return
         
-        # Convert time option back to readable format
-        time_readable = time_option.replace('_', ' ')
+        due_at = compute_due_at(time_readable)
         
-        # Save reminder (simplified version - in production you'd integrate with a scheduler)
-        db.save_user_reminder(username, airdrop_id, time_readable, "once")
+        if due_at is None:
+            await query.answer("❌ Unknown reminder option!", show_alert=True)
+            return
+        
+        reminder = await db.save_user_reminder_async(
+            username, airdrop_id, time_readable, "once", due_at, query.from_user.id
+        )
+        self.scheduler.schedule(username, reminder)
         
         await query.answer(f"⏰ Reminder set for '{airdrop['title']}' in {time_readable}!", show_alert=True)
         
@@ -429,14 +972,16 @@ class AirdropBot:
 
     async def show_reminders(self, query, username: str):
         """Show user's active reminders"""
-        reminders = db.load_user_reminders(username)
+        reminders = await db.load_user_reminders_async(username)
+        reminders = [reminder for reminder in reminders if reminder.get('status', 'pending') == 'pending']
         
         if not reminders:
-            await query.edit_message_text(
+            await self.edit_screen(
+                query,
                 "⏰ **My Reminders**\n\n📭 No active reminders.\n\nSet reminders from airdrop details to stay updated!",
                 reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🌟 Browse Airdrops", callback_data="all_drops_1")],
-                    [InlineKeyboardButton("🔙 Back to Main", callback_data="back_to_main")]
+                    [InlineKeyboardButton("🌟 Browse Airdrops", callback_data=self.router.encode("all_drops", 1))],
+                    [InlineKeyboardButton("🔙 Back to Main", callback_data=self.router.encode("main"))]
                 ]),
                 parse_mode=ParseMode.MARKDOWN
             )
@@ -444,22 +989,20 @@ class AirdropBot:
         
         message = "⏰ **My Active Reminders**\n\n"
         
-        all_data = db.load_all_airdrops()
-        all_airdrops = {airdrop['id']: airdrop for airdrop in all_data.get("airdrops", [])}
-        
         for i, reminder in enumerate(reminders[-10:], 1):  # Show last 10 reminders
-            airdrop_id = reminder['airdrop_id']
-            if airdrop_id in all_airdrops:
-                airdrop_title = all_airdrops[airdrop_id]['title']
+            airdrop = db.get_airdrop_by_id(reminder['airdrop_id'])
+            if airdrop:
+                airdrop_title = airdrop['title']
                 message += f"{i}. 🎯 **{airdrop_title}**\n"
                 message += f"   ⏰ Remind in: {reminder['remind_time']}\n"
                 message += f"   📅 Set on: {reminder['created_at'][:10]}\n\n"
         
         keyboard = [
-            [InlineKeyboardButton("🔙 Back to Main", callback_data="back_to_main")]
+            [InlineKeyboardButton("🔙 Back to Main", callback_data=self.router.encode("main"))]
         ]
         
-        await query.edit_message_text(
+        await self.edit_screen(
+            query,
             message,
             reply_markup=InlineKeyboardMarkup(keyboard),
             parse_mode=ParseMode.MARKDOWN
@@ -476,12 +1019,37 @@ class AirdropBot:
         
         keyboard = self.get_main_keyboard()
         
-        await query.edit_message_text(
+        await self.edit_screen(
+            query,
             message,
             reply_markup=keyboard,
             parse_mode=ParseMode.MARKDOWN
         )
 
+    async def deliver_reminder(self, username: str, reminder: dict):
+        """Send a due reminder to the user who set it"""
+        airdrop = db.get_airdrop_by_id(reminder['airdrop_id'])
+        
+        if airdrop and reminder.get('chat_id'):
+            message = f"⏰ **Reminder: {airdrop['title']}**\n\n" \
+                     f"💰 Reward: {airdrop.get('reward', 'TBA')}\n" \
+                     f"📅 End Date: {airdrop.get('end_date', 'TBA')}"
+            
+            await self.application.bot.send_message(
+                chat_id=reminder['chat_id'],
+                text=message,
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🎯 View Airdrop", callback_data=self.router.encode("airdrop", airdrop['id']))
+                ]]),
+                parse_mode=ParseMode.MARKDOWN
+            )
+        
+        await db.mark_reminder_delivered_async(username, reminder['id'])
+    
+    async def discard_reminder(self, username: str, reminder: dict):
+        """Take a reminder that cannot be delivered out of the pending index"""
+        await db.mark_reminder_delivered_async(username, reminder['id'])
+
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle regular text messages"""
         await update.message.reply_text(
@@ -492,7 +1060,18 @@ class AirdropBot:
     def run(self):
         """Run the bot"""
         logger.info("Starting Airdrop Hunter Bot...")
-        self.application.run_polling()
+        if Config.METRICS_ENABLED:
+            metrics.start_metrics_server()
+        try:
+            self.application.run_polling()
+        finally:
+            db.shutdown()
+
+def main():
+    """Prepare storage and run the bot in polling mode"""
+    from utils.update_processor import UserOrderedUpdateProcessor
+    init()
+    AirdropBot(update_processor=UserOrderedUpdateProcessor(Config.MAX_CONCURRENT_UPDATES)).run()
 
-# Global bot instance
-bot = AirdropBot()
+if __name__ == "__main__":
+    main()
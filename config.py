@@ -8,15 +8,148 @@ class Config:
     FLASK_PORT = 5000
     FLASK_HOST = "0.0.0.0"
     
+    # Webhook mode (app.py); WEBHOOK_URL is the public base URL, if set it is registered on startup
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+    WEBHOOK_PATH = "/webhook"
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    
+    # Reload pending reminders and resume broadcasts at startup. Of the processes sharing
+    # the data directory only the one holding BACKGROUND_JOBS_LOCK does it
+    RUN_BACKGROUND_JOBS = os.getenv("RUN_BACKGROUND_JOBS", "1") == "1"
+    # Processes serving the same data directory (gunicorn also takes its default -w from this)
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+    
     # Pagination settings
     AIRDROPS_PER_PAGE = 5
     
+    # Max rendered screens kept in memory
+    RENDER_CACHE_SIZE = 2048
+    # Messages whose last shown text/keyboard is remembered to skip unchanged edits.
+    # Per process: a remembered screen is only trusted while the message in the
+    # callback still matches what this process got back from its own last edit
+    SCREEN_FINGERPRINT_CACHE_SIZE = 50000
+    
+    # Per-user session cache: wishlist and reminders of recently active users.
+    # Sessions live in one process and never see another process's writes, so they
+    # are only kept when a single process serves each user (one worker, or sharding.py)
+    SESSION_CACHE = WEB_CONCURRENCY <= 1
+    SESSION_CACHE_SIZE = 100000
+    SESSION_TTL = 1800
+    SESSION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    
+    # Updates handled at once; one user's messages stay in order, button presses are ordered per message
+    MAX_CONCURRENT_UPDATES = 64
+    
+    # Seconds a burst of navigation presses on one message settles before the last one renders
+    CALLBACK_DEBOUNCE = 0.15
+    
+    # Server-side storage for callback payloads over Telegram's 64-byte limit
+    CALLBACK_TOKEN_STORE_SIZE = 100000
+    CALLBACK_TOKEN_TTL = 7 * 24 * 3600
+    
+    # Broadcast settings (Telegram allows ~30 msg/s overall, 1 msg/s per chat)
+    BROADCAST_RATE = 25
+    BROADCAST_BURST = 25
+    BROADCAST_CONCURRENCY = 8
+    BROADCAST_CHECKPOINT_EVERY = 100
+    ADMIN_USER_IDS = {int(x) for x in os.getenv("ADMIN_USER_IDS", "").split(",") if x.strip()}
+    
+    # Alternative Bot API endpoint, e.g. a local test server
+    TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL")
+    
+    # Prometheus metrics; polling mode serves /metrics on METRICS_PORT, webhook mode on the Flask app
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+    METRICS_PORT = int(os.getenv("METRICS_PORT", FLASK_PORT))
+    METRICS_LOOP_LAG_INTERVAL = 0.5
+    
+    # Profiling: fraction of updates sampled, and updates slower than the threshold (seconds,
+    # 0 = off) are dumped to PROFILES_DIR, keeping the newest PROFILE_MAX_FILES dumps
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_SLOW_THRESHOLD = float(os.getenv("PROFILE_SLOW_THRESHOLD", "0"))
+    PROFILE_MAX_FILES = 200
+    PROFILE_INTERVAL = 0.005
+    PROFILE_SIGNAL_SECONDS = 30
+    PROFILE_MAX_SECONDS = 300
+    
+    # Search settings
+    SEARCH_RESULTS_LIMIT = 10
+    SEARCH_CACHE_SIZE = 4096
+    SEARCH_MAX_PREFIX_EXPANSIONS = 50
+    INLINE_QUERY_CACHE_TIME = 60
+    
     # File paths
     DATA_DIR = "data"
     ALLDROPS_FILE = os.path.join(DATA_DIR, "alldrops.json")
     BANNERS_DIR = os.path.join(DATA_DIR, "AirdropBanners")
     USER_DROPS_DIR = os.path.join(DATA_DIR, "UserDrops")
     REMINDERS_DIR = os.path.join(DATA_DIR, "Reminders")
+    PENDING_REMINDERS_FILE = os.path.join(REMINDERS_DIR, "pending.jsonl")
+    BACKGROUND_JOBS_LOCK = os.path.join(DATA_DIR, "background_jobs.lock")
+    USERS_FILE = os.path.join(DATA_DIR, "users.jsonl")
+    BROADCASTS_DIR = os.path.join(DATA_DIR, "Broadcasts")
+    PROFILES_DIR = os.path.join(DATA_DIR, "Profiles")
+    # Overflowing callback payloads, shared by every worker and kept across restarts
+    CALLBACK_TOKEN_DB = os.path.join(DATA_DIR, "callback_tokens.db")
+    
+    # Banners: resized copies keyed by content hash, and the Telegram file_id each was uploaded as
+    BANNER_THUMBS_DIR = os.path.join(DATA_DIR, "BannerCache")
+    BANNER_FILE_IDS_FILE = os.path.join(BANNER_THUMBS_DIR, "file_ids.json")
+    BANNER_MAX_SIDE = 1280
+    BANNER_JPEG_QUALITY = 85
+    # Telegram's photo caption limit; longer detail screens are sent as text without the banner
+    CAPTION_MAX_LENGTH = 1024
+    
+    # Seconds between alldrops.json mtime checks
+    CATALOG_CHECK_INTERVAL = 1.0
+    # Background reloading (inotify on Linux, otherwise polling every CATALOG_CHECK_INTERVAL)
+    CATALOG_WATCH = os.getenv("CATALOG_WATCH", "1") == "1"
+    CATALOG_RELOAD_DEBOUNCE = 0.2
+    CATALOG_WATCH_RESCAN_INTERVAL = 30.0
+    
+    # Status engine: derive ending_soon/expired from end_date as deadlines pass
+    STATUS_ENGINE = os.getenv("STATUS_ENGINE", "1") == "1"
+    ENDING_SOON_DAYS = 3
+    STATUS_STATE_FILE = os.path.join(DATA_DIR, "status_state.json")
+    # Longest sleep between deadline checks, in case the wall clock jumps
+    STATUS_MAX_SLEEP = 3600.0
+    
+    # Memory-mapped catalog snapshot read instead of alldrops.json (sharded mode)
+    CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT")
+    
+    # Sharded mode: this process owns users with hash(user_id) % SHARD_COUNT == SHARD_ID
+    SHARD_ID = 0
+    SHARD_COUNT = 1
+    SHARD_MAX_CONCURRENT_UPDATES = 64
+    
+    # User storage backend: "json" (one file per user) or "sqlite"
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+    SQLITE_PATH = os.path.join(DATA_DIR, "airdrop_hunter.db")
+    
+    # Max threads used for blocking user storage I/O
+    STORAGE_WORKERS = 8
+    
+    # Seconds to buffer wishlist changes before one flush per user (0 = write each add/remove
+    # through). The buffer holds and rewrites the whole list, so it is off when several
+    # processes serve the same users
+    WRITE_BEHIND_WINDOW = 2.0 if WEB_CONCURRENCY <= 1 else 0.0
+    FSYNC_WRITES = True
+    
+    # JSON backend: wishlist/reminder changes go to an append-only journal that is
+    # folded into the per-user files in the background. Other processes cannot see
+    # records that have not been folded yet, so with WEB_CONCURRENCY > 1 every worker
+    # writes the files directly instead (JOURNAL_FILE is also locked to one process)
+    USER_JOURNAL = os.getenv("USER_JOURNAL", "1") == "1" and WEB_CONCURRENCY <= 1
+    JOURNAL_FILE = os.path.join(DATA_DIR, "user_journal.log")
+    # Writers arriving during an fsync share the next one; a small delay (e.g. 0.002)
+    # batches more under heavy load at the cost of latency for a lone writer
+    JOURNAL_GROUP_COMMIT_DELAY = 0.0
+    JOURNAL_COMPACT_INTERVAL = 60.0
+    JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+    
+    # Failed reminder deliveries are retried after 30s, 60s, 120s, ... and then dropped;
+    # blocked or deleted chats are dropped at once. Sends share the BROADCAST_RATE budget
+    REMINDER_RETRY_DELAY = 30.0
+    REMINDER_MAX_RETRIES = 5
     
     # Reminder options (in minutes)
     REMINDER_OPTIONS = {
@@ -27,3 +160,27 @@ class Config:
         "3 days": 4320,
         "1 week": 10080
     }
+    
+    @classmethod
+    def apply_shard(cls, shard_id: int, shard_count: int, snapshot_path: str):
+        """Point shared state files at this shard's own copies"""
+        cls.SHARD_ID = shard_id
+        cls.SHARD_COUNT = shard_count
+        cls.CATALOG_SNAPSHOT = snapshot_path
+        suffix = f".shard{shard_id}"
+        cls.USERS_FILE += suffix
+        cls.PENDING_REMINDERS_FILE += suffix
+        cls.BACKGROUND_JOBS_LOCK += suffix
+        cls.SQLITE_PATH += suffix
+        cls.BROADCASTS_DIR = os.path.join(cls.BROADCASTS_DIR, f"shard{shard_id}")
+        cls.PROFILES_DIR = os.path.join(cls.PROFILES_DIR, f"shard{shard_id}")
+        cls.BANNER_FILE_IDS_FILE += suffix
+        cls.STATUS_STATE_FILE += suffix
+        cls.JOURNAL_FILE += suffix
+        # Each user belongs to exactly one shard
+        cls.SESSION_CACHE = True
+        # The front process owns METRICS_PORT, workers take the ports after it
+        cls.METRICS_PORT = cls.METRICS_PORT + 1 + shard_id
+        # Every shard broadcasts to its own users, so split the global budget
+        cls.BROADCAST_RATE = cls.BROADCAST_RATE / shard_count
+        cls.BROADCAST_BURST = max(1, cls.BROADCAST_BURST / shard_count)
@@ -0,0 +1,49 @@
+"""Ingest partner CSV/JSONL feeds into data/alldrops.json
+
+Records are validated against the airdrop schema across a process pool and
+merged into the existing catalog by id (later records win, empty fields keep
+the old value). The catalog is replaced atomically, so a running bot picks up
+the new file on its next reload.
+"""
+import argparse
+import json
+import sys
+from config import Config
+from utils.ingest import ingest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("feeds", nargs="+", help=".csv, .jsonl or .ndjson files, read in order")
+    parser.add_argument("--output", default=Config.ALLDROPS_FILE, help="catalog to write (default: %(default)s)")
+    parser.add_argument("--replace", action="store_true", help="build the catalog from the feeds only")
+    parser.add_argument("--workers", type=int, default=None, help="validation processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--rejects", help="write rejected records to this JSONL file")
+    parser.add_argument("--dry-run", action="store_true", help="validate and report without writing")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        report = ingest(
+            args.feeds, output=args.output, merge_existing=not args.replace, workers=args.workers,
+            chunk_size=args.chunk_size, dry_run=args.dry_run, rejects_path=args.rejects
+        )
+    except (OSError, ValueError) as e:
+        print(f"Ingestion aborted, catalog left unchanged: {e}", file=sys.stderr)
+        raise SystemExit(1)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Read {report['records']} records in {report['elapsed']:.2f}s "
+          f"({report['records_per_second']} records/s)")
+    print(f"Accepted {report['accepted']} ({report['added']} new, {report['merged']} merged by id), "
+          f"rejected {report['rejected']}")
+    for reason, count in report["reject_reasons"].items():
+        print(f"  {count:>8}  {reason}")
+    action = "Wrote" if report["written"] else "Would write"
+    print(f"{action} {report['catalog_size']} airdrops to {args.output}")
+
+if __name__ == "__main__":
+    main()
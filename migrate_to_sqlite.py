@@ -0,0 +1,33 @@
+"""One-shot import of data/UserDrops and data/Reminders into the SQLite backend"""
+import argparse
+import time
+from config import Config
+from utils.database import DatabaseManager
+from utils.sqlite_backend import SQLiteDatabaseManager
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default=Config.SQLITE_PATH, help="SQLite database path")
+    parser.add_argument("--user-drops-dir", default=Config.USER_DROPS_DIR)
+    parser.add_argument("--reminders-dir", default=Config.REMINDERS_DIR)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    # Fold changes still in the JSON backend's journal into the files imported below
+    json_manager = DatabaseManager()
+    json_manager.open_journal()
+    json_manager.shutdown()
+
+    manager = SQLiteDatabaseManager(args.db)
+    manager.init()
+    counts = manager.import_json_directories(args.user_drops_dir, args.reminders_dir)
+    elapsed = time.perf_counter() - started
+
+    print(f"Imported {counts['drops']} wishlist entries for {counts['users']} users "
+          f"and {counts['reminders']} reminders into {args.db} in {elapsed:.2f}s")
+    if counts["skipped_files"]:
+        print(f"Skipped {counts['skipped_files']} unreadable files")
+    print("Set STORAGE_BACKEND=sqlite to switch the bot over.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Sharded deployment: a webhook front process routes updates by user to N bot workers
+
+Each worker owns the state of the users hashed to it (its own registry,
+pending-reminder index, SQLite file and broadcast checkpoints) and reads the
+catalog from a memory-mapped snapshot written by the front process.
+The front process serves /metrics on FLASK_PORT; worker N serves its own on
+METRICS_PORT + 1 + N.
+Updates for one user always go to the same worker through one FIFO queue.
+There a user's messages and data-changing button presses run one at a time,
+so their writes never race; navigation presses skip the wait.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from typing import Dict, Optional
+from flask import Flask, Response, abort, jsonify, request
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Update fields that carry the sending user
+USER_FIELDS = (
+    "message", "edited_message", "callback_query", "inline_query",
+    "chosen_inline_result", "shipping_query", "pre_checkout_query",
+    "my_chat_member", "chat_member", "chat_join_request"
+)
+
+def update_user_id(data: Dict) -> Optional[int]:
+    """Pull the sender's user id out of a raw update dict"""
+    for field in USER_FIELDS:
+        payload = data.get(field)
+        if payload and payload.get("from"):
+            return payload["from"]["id"]
+    return None
+
+def shard_for(user_id: Optional[int], shard_count: int) -> int:
+    """Stable user -> shard assignment"""
+    if user_id is None:
+        return 0
+    return user_id % shard_count
+
+def is_broadcast_command(data: Dict) -> bool:
+    text = (data.get("message") or {}).get("text") or ""
+    return text.startswith("/broadcast")
+
+def run_worker(shard_id: int, shard_count: int, snapshot_path: str, inbox):
+    """Worker process entry point"""
+    logging.basicConfig(
+        format=f'%(asctime)s - shard{shard_id} - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    # Must happen before utils is imported, since storage reads these paths at startup
+    Config.apply_shard(shard_id, shard_count, snapshot_path)
+
+    from telegram import Update
+    from bot import AirdropBot
+    from utils import init
+    from utils.update_processor import UserOrderedUpdateProcessor
+    init()
+
+    async def main():
+        airdrop_bot = AirdropBot(
+            update_processor=UserOrderedUpdateProcessor(Config.SHARD_MAX_CONCURRENT_UPDATES)
+        )
+        application = airdrop_bot.application
+        await application.initialize()
+        await application.post_init(application)
+        await application.start()
+        if Config.METRICS_ENABLED:
+            from utils.metrics import start_metrics_server
+            start_metrics_server()
+
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                data = await loop.run_in_executor(None, inbox.get)
+                if data is None:
+                    break
+                application.update_queue.put_nowait(Update.de_json(data, application.bot))
+        finally:
+            await application.stop()
+            await application.post_shutdown(application)
+            await application.shutdown()
+
+    asyncio.run(main())
+
+class ShardRouter:
+    """Front process: owns the worker processes, their queues and the catalog snapshot"""
+
+    def __init__(self, shard_count: int, snapshot_path: str = None):
+        self.shard_count = shard_count
+        self.snapshot_path = snapshot_path or os.path.join(Config.DATA_DIR, "catalog.snapshot")
+        self._ctx = multiprocessing.get_context("spawn")
+        self.inboxes = [self._ctx.Queue() for _ in range(shard_count)]
+        self.workers = []
+        self._catalog_stamp = None
+        self._stop = threading.Event()
+
+    def write_snapshot_if_changed(self) -> bool:
+        """Rebuild the shared snapshot when alldrops.json changes; keep the old one on errors"""
+        from utils.models import iter_airdrops
+        from utils.snapshot import write_snapshot
+
+        try:
+            st = os.stat(Config.ALLDROPS_FILE)
+        except FileNotFoundError:
+            return False
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._catalog_stamp and os.path.exists(self.snapshot_path):
+            return False
+        try:
+            count = write_snapshot(iter_airdrops(Config.ALLDROPS_FILE), self.snapshot_path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Not updating catalog snapshot: {e}")
+            return False
+        self._catalog_stamp = stamp
+        logger.info(f"Wrote catalog snapshot with {count} airdrops")
+        return True
+
+    def _watch_catalog(self):
+        while not self._stop.wait(Config.CATALOG_CHECK_INTERVAL):
+            self.write_snapshot_if_changed()
+
+    def start(self):
+        self.write_snapshot_if_changed()
+        for shard_id, inbox in enumerate(self.inboxes):
+            worker = self._ctx.Process(
+                target=run_worker,
+                args=(shard_id, self.shard_count, self.snapshot_path, inbox),
+                name=f"shard{shard_id}"
+            )
+            worker.start()
+            self.workers.append(worker)
+        threading.Thread(target=self._watch_catalog, name="catalog-snapshot", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for worker in self.workers:
+            worker.join(timeout=30)
+
+    def dispatch(self, data: Dict):
+        """Queue an update on its user's shard; admin broadcasts go to every shard"""
+        if is_broadcast_command(data):
+            for inbox in self.inboxes:
+                inbox.put(data)
+            return
+        self.inboxes[shard_for(update_user_id(data), self.shard_count)].put(data)
+
+def create_sharded_app(shard_count: int) -> Flask:
+    """Flask front that routes webhook updates to user-sharded workers"""
+    from utils import init
+    from utils.metrics import CONTENT_TYPE, registry
+    init()
+    router = ShardRouter(shard_count)
+    router.start()
+    registry.gauge("airdrop_bot_shard_queue_size", "Updates waiting in each shard's inbox",
+                   lambda: {i: inbox.qsize() for i, inbox in enumerate(router.inboxes)}, ("shard",))
+
+    app = Flask(__name__)
+    app.config["SHARD_ROUTER"] = router
+
+    @app.post(Config.WEBHOOK_PATH)
+    def webhook():
+        if Config.WEBHOOK_SECRET and \
+                request.headers.get("X-Telegram-Bot-Api-Secret-Token") != Config.WEBHOOK_SECRET:
+            abort(403)
+        data = request.get_json(silent=True)
+        if not data:
+            abort(400)
+        router.dispatch(data)
+        return "", 200
+
+    @app.get("/health")
+    def health():
+        workers = [
+            {"shard": i, "alive": worker.is_alive(), "queue": router.inboxes[i].qsize()}
+            for i, worker in enumerate(router.workers)
+        ]
+        status = "ok" if all(w["alive"] for w in workers) else "degraded"
+        return jsonify(status=status, workers=workers, time=time.time()), 200 if status == "ok" else 503
+
+    @app.get("/metrics")
+    def metrics():
+        if not Config.METRICS_ENABLED:
+            abort(404)
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot as N user-sharded worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    sharded_app = create_sharded_app(args.workers)
+    try:
+        # One front process only: a second one would not share the per-user FIFO order
+        sharded_app.run(host=Config.FLASK_HOST, port=Config.FLASK_PORT, threaded=True)
+    finally:
+        sharded_app.config["SHARD_ROUTER"].stop()
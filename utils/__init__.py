@@ -1,5 +1,11 @@
 # utils/__init__.py
 from .database import db
 from .helpers import pagination, formatter, file_helper, validator
+from .cache import render_cache
 
-__all__ = ['db', 'pagination', 'formatter', 'file_helper', 'validator']
+def init():
+    """Prepare on-disk state: data directories, sample catalog and banners, storage schema"""
+    db.init()
+    file_helper.create_sample_banner_files()
+
+__all__ = ['db', 'pagination', 'formatter', 'file_helper', 'validator', 'render_cache', 'init']
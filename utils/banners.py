@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+from config import Config
+from utils.helpers import FileHelper
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of the formats Telegram accepts as photos
+IMAGE_SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a')
+
+def is_image(header: bytes) -> bool:
+    return header.startswith(IMAGE_SIGNATURES) or (header[:4] == b'RIFF' and header[8:12] == b'WEBP')
+
+def file_digest(path: str) -> str:
+    """Return a short content hash used as the banner's identity"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+class BannerStore:
+    """Banner images prepared for upload, and the Telegram file_id each one got
+
+    Banners are identified by a hash of their content, so a banner shared by
+    several airdrops, or renamed, is uploaded once. The file_id map survives
+    restarts; prepared entries are kept in memory and only re-hashed when a
+    banner's mtime or size changes.
+    """
+
+    def __init__(self, file_ids_path: str = None, thumbs_dir: str = None):
+        self.file_ids_path = file_ids_path or Config.BANNER_FILE_IDS_FILE
+        self.thumbs_dir = thumbs_dir or Config.BANNER_THUMBS_DIR
+        self._file_ids = None
+        # banner filename -> (mtime_ns, size, digest, upload_path), or None if unusable
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.prewarmed_version = None
+        self.uploads = 0
+        self.reuses = 0
+
+    def get(self, banner_filename: str) -> Optional[Tuple[str, str]]:
+        """Return (digest, upload_path) if the banner was prepared, without touching the disk"""
+        entry = self._entries.get(banner_filename)
+        return entry[2:] if entry else None
+
+    def is_known(self, banner_filename: str) -> bool:
+        return banner_filename in self._entries
+
+    def prepare(self, banner_filename: str) -> Optional[Tuple[str, str]]:
+        """Hash and thumbnail one banner if it changed; blocking, run it off the event loop"""
+        path = FileHelper.get_banner_path(banner_filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._entries[banner_filename] = None
+            return None
+
+        entry = self._entries.get(banner_filename)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2:]
+
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(16)
+            if not is_image(header):
+                # e.g. the placeholder files written by FileHelper.create_sample_banner_files
+                self._entries[banner_filename] = None
+                return None
+            digest = file_digest(path)
+            upload_path = self._make_thumbnail(path, digest)
+        except OSError as e:
+            logger.warning(f"Could not prepare banner {banner_filename}: {e}")
+            self._entries[banner_filename] = None
+            return None
+
+        self._entries[banner_filename] = (stat.st_mtime_ns, stat.st_size, digest, upload_path)
+        return digest, upload_path
+
+    def _make_thumbnail(self, path: str, digest: str) -> str:
+        """Write a resized, recompressed JPEG for the banner; fall back to the original"""
+        thumb_path = os.path.join(self.thumbs_dir, f"{digest}.jpg")
+        if os.path.exists(thumb_path):
+            return thumb_path
+        try:
+            from PIL import Image
+        except ImportError:
+            return path
+
+        try:
+            os.makedirs(self.thumbs_dir, exist_ok=True)
+            tmp_path = f"{thumb_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with Image.open(path) as image:
+                image = image.convert('RGB')
+                image.thumbnail((Config.BANNER_MAX_SIDE, Config.BANNER_MAX_SIDE))
+                image.save(tmp_path, 'JPEG', quality=Config.BANNER_JPEG_QUALITY, optimize=True, progressive=True)
+            if os.path.getsize(tmp_path) >= os.path.getsize(path):
+                # Already small; keep the original bytes
+                os.remove(tmp_path)
+                return path
+            os.replace(tmp_path, thumb_path)
+            return thumb_path
+        except Exception as e:
+            logger.warning(f"Could not resize banner {path}: {e}")
+            return path
+
+    def prewarm(self, banner_filenames: Iterable[str], catalog_version: int = None) -> int:
+        """Prepare every banner the catalog references; returns how many are usable"""
+        filenames = set(filter(None, banner_filenames))
+        with self._lock:
+            for stale in set(self._entries) - filenames:
+                del self._entries[stale]
+            usable = sum(1 for filename in filenames if self.prepare(filename))
+            self.prewarmed_version = catalog_version
+        logger.info(f"Prepared {usable} of {len(filenames)} banners")
+        return usable
+
+    def _read_file_ids(self) -> Dict[str, list]:
+        try:
+            with open(self.file_ids_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read {self.file_ids_path}: {e}")
+            return {}
+
+    def _load_file_ids(self) -> Dict[str, list]:
+        if self._file_ids is None:
+            self._file_ids = self._read_file_ids()
+        return self._file_ids
+
+    def file_id(self, digest: str) -> Optional[Tuple[str, str]]:
+        """Return (file_id, file_unique_id) a banner was uploaded as, if any"""
+        ids = self._load_file_ids().get(digest)
+        return tuple(ids) if ids else None
+
+    def remember(self, digest: str, file_id: str, file_unique_id: str):
+        """Record an upload and persist the map"""
+        with self._lock:
+            file_ids = self._load_file_ids()
+            if file_ids.get(digest) == [file_id, file_unique_id]:
+                return
+            self._save_file_ids(digest, [file_id, file_unique_id])
+
+    def forget(self, digest: str):
+        """Drop a file_id Telegram no longer accepts"""
+        with self._lock:
+            if digest in self._load_file_ids():
+                self._save_file_ids(digest, None)
+
+    def _save_file_ids(self, digest: str, ids: Optional[list]):
+        """Set (or with None, drop) one entry in the map on disk and reload ours from it
+
+        Other workers save to the same file, so the change is merged into what
+        is on disk rather than overwriting it with this process's copy.
+        """
+        directory = os.path.dirname(self.file_ids_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_ids = self._read_file_ids()
+        if ids is None:
+            file_ids.pop(digest, None)
+        else:
+            file_ids[digest] = ids
+        tmp_path = f"{self.file_ids_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(file_ids, f, separators=(',', ':'))
+        os.replace(tmp_path, self.file_ids_path)
+        self._file_ids = file_ids
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'prepared': sum(1 for entry in self._entries.values() if entry),
+            'file_ids': len(self._load_file_ids()),
+            'uploads': self.uploads,
+            'reuses': self.reuses
+        }
+
+# Global banner store
+banner_store = BannerStore()
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Iterable, List, Tuple
+from telegram.error import BadRequest, Forbidden, RetryAfter, TimedOut, NetworkError
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Async token bucket; pause() stalls every sender after a flood-wait"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the given time"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self):
+        """Wait until one token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    self._updated = time.monotonic()
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class BroadcastCheckpoint:
+    """On-disk progress of one broadcast: a header plus an append-only log of finished chats"""
+
+    def __init__(self, broadcast_id: str, directory: str = None):
+        directory = directory or Config.BROADCASTS_DIR
+        self.broadcast_id = broadcast_id
+        self.header_path = os.path.join(directory, f"{broadcast_id}.json")
+        self.progress_path = os.path.join(directory, f"{broadcast_id}.progress")
+
+    def create(self, text: str, targets: List[Tuple[str, int]]):
+        tmp_path = self.header_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"id": self.broadcast_id, "text": text, "targets": targets,
+                       "created_at": time.time(), "finished": False}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.header_path)
+
+    def load(self) -> Dict:
+        with open(self.header_path, 'r') as f:
+            return json.load(f)
+
+    def completed(self) -> set:
+        """Chat IDs already handled by an earlier run"""
+        try:
+            with open(self.progress_path, 'r') as f:
+                return {int(line) for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+
+    def append(self, chat_ids: Iterable[int]):
+        with open(self.progress_path, 'a') as f:
+            f.write("".join(f"{chat_id}\n" for chat_id in chat_ids))
+
+    def finish(self):
+        header = self.load()
+        header["finished"] = True
+        tmp_path = self.header_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(header, f, separators=(',', ':'))
+        os.replace(tmp_path, self.header_path)
+
+    @staticmethod
+    def unfinished(directory: str = None) -> List[str]:
+        """IDs of broadcasts interrupted before completion"""
+        directory = directory or Config.BROADCASTS_DIR
+        ids = []
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                checkpoint = BroadcastCheckpoint(name[:-len(".json")], directory)
+                try:
+                    if not checkpoint.load().get("finished"):
+                        ids.append(checkpoint.broadcast_id)
+                except (OSError, ValueError):
+                    continue
+        return ids
+
+class Broadcaster:
+    """Fans a message out to many chats within Telegram's flood limits
+
+    Checkpoint files are read and written on the default executor, never on the event loop.
+    """
+
+    def __init__(self, bot, rate: float = None, burst: float = None, concurrency: int = None,
+                 directory: str = None):
+        self.bot = bot
+        self.bucket = TokenBucket(rate or Config.BROADCAST_RATE, burst or Config.BROADCAST_BURST)
+        self.concurrency = concurrency or Config.BROADCAST_CONCURRENCY
+        self.directory = directory or Config.BROADCASTS_DIR
+
+    async def start(self, text: str, targets: List[Tuple[str, int]], reply_markup=None) -> Dict:
+        """Checkpoint a new broadcast and send it"""
+        broadcast_id = uuid.uuid4().hex[:12]
+        # One message per chat, however many usernames share it
+        unique = list({chat_id: (username, chat_id) for username, chat_id in targets}.values())
+        checkpoint = BroadcastCheckpoint(broadcast_id, self.directory)
+        await asyncio.get_running_loop().run_in_executor(None, checkpoint.create, text, unique)
+        return await self.run(broadcast_id, reply_markup)
+
+    async def resume_all(self) -> List[Dict]:
+        """Finish every broadcast left incomplete by a restart"""
+        unfinished = await asyncio.get_running_loop().run_in_executor(
+            None, BroadcastCheckpoint.unfinished, self.directory
+        )
+        return [await self.run(broadcast_id) for broadcast_id in unfinished]
+
+    async def run(self, broadcast_id: str, reply_markup=None) -> Dict:
+        """Send (or resume) a checkpointed broadcast and return throughput stats"""
+        loop = asyncio.get_running_loop()
+        checkpoint = BroadcastCheckpoint(broadcast_id, self.directory)
+        header = await loop.run_in_executor(None, checkpoint.load)
+        done = await loop.run_in_executor(None, checkpoint.completed)
+        pending = [chat_id for _, chat_id in header["targets"] if chat_id not in done]
+
+        stats = {"id": broadcast_id, "total": len(header["targets"]), "skipped": len(done),
+                 "sent": 0, "failed": 0, "retries": 0}
+        queue = asyncio.Queue()
+        for chat_id in pending:
+            queue.put_nowait(chat_id)
+        finished = []
+        started = time.monotonic()
+
+        async def sender():
+            while True:
+                try:
+                    chat_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                attempts = 0
+                while True:
+                    await self.bucket.acquire()
+                    try:
+                        await self.bot.send_message(chat_id=chat_id, text=header["text"],
+                                                    reply_markup=reply_markup)
+                        stats["sent"] += 1
+                        break
+                    except RetryAfter as e:
+                        stats["retries"] += 1
+                        retry_after = e.retry_after
+                        if not isinstance(retry_after, (int, float)):
+                            retry_after = retry_after.total_seconds()
+                        self.bucket.pause(retry_after)
+                    except (TimedOut, NetworkError) as e:
+                        attempts += 1
+                        stats["retries"] += 1
+                        if attempts >= 3:
+                            logger.warning(f"Broadcast {broadcast_id}: giving up on {chat_id}: {e}")
+                            stats["failed"] += 1
+                            break
+                        await asyncio.sleep(2 ** attempts)
+                    except (Forbidden, BadRequest):
+                        # Blocked the bot or chat no longer exists; do not retry
+                        stats["failed"] += 1
+                        break
+                finished.append(chat_id)
+                if len(finished) >= Config.BROADCAST_CHECKPOINT_EVERY:
+                    batch = finished[:]
+                    finished.clear()
+                    await loop.run_in_executor(None, checkpoint.append, batch)
+
+        try:
+            await asyncio.gather(*(sender() for _ in range(self.concurrency)))
+        finally:
+            if finished:
+                await loop.run_in_executor(None, checkpoint.append, finished)
+
+        await loop.run_in_executor(None, checkpoint.finish)
+        elapsed = time.monotonic() - started
+        stats["elapsed"] = round(elapsed, 3)
+        stats["per_second"] = round((stats["sent"] + stats["failed"]) / elapsed, 2) if elapsed else 0.0
+        logger.info(f"Broadcast {broadcast_id} finished: {stats}")
+        return stats
+
+async def resolve_targets(db, target: str) -> List[Tuple[str, int]]:
+    """Turn 'all', 'category:<name>' or 'wishlist:<airdrop_id>' into (username, chat_id) pairs"""
+    users = await db.list_users_async()
+    if target == "all":
+        return users
+
+    kind, _, value = target.partition(":")
+    if kind == "category":
+        airdrop_ids = db.catalog.ids_by_category(value)
+    elif kind == "wishlist":
+        airdrop_ids = [value]
+    else:
+        raise ValueError(f"Unknown broadcast target: {target}")
+
+    usernames = await db.users_with_drops_async(airdrop_ids)
+    return [(username, chat_id) for username, chat_id in users if username in usernames]
@@ -0,0 +1,177 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from config import Config
+
+class LRUCache:
+    """Size-bounded least-recently-used cache with hit/miss counters"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value and mark it recently used"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a single entry"""
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def evict(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop the entries whose key matches; returns how many"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def stats(self) -> Dict[str, float]:
+        """Return size, hit/miss counters and hit ratio"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
+
+class RenderCache(LRUCache):
+    """LRU of finished (text, keyboard) screens, emptied when the catalog changes"""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = None):
+        super().__init__(maxsize or Config.RENDER_CACHE_SIZE)
+        self.catalog_version = None
+
+    def get_or_render(self, key: Hashable, catalog_version: int, render: Callable[[], Any]) -> Any:
+        """Return the cached rendering for key, building it on a miss"""
+        if catalog_version != self.catalog_version:
+            self.clear()
+            self.catalog_version = catalog_version
+
+        full_key = (key, catalog_version)
+        value = self.get(full_key, self._MISSING)
+        if value is self._MISSING:
+            value = render()
+            self.put(full_key, value)
+        return value
+
+    def evict_views(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop cached screens whose view key (without the catalog version) matches"""
+        return self.evict(lambda full_key: predicate(full_key[0]))
+
+def markup_fingerprint(reply_markup) -> Optional[int]:
+    """Hash of an inline keyboard's buttons; None for no keyboard"""
+    if reply_markup is None:
+        return None
+    return hash(tuple(
+        tuple((button.text, button.callback_data, button.url, button.switch_inline_query,
+               button.switch_inline_query_current_chat) for button in row)
+        for row in reply_markup.inline_keyboard
+    ))
+
+class ScreenFingerprints(LRUCache):
+    """What each message was last edited to, so unchanged edits are never sent
+
+    Keyed by (chat_id, message_id); values are (fingerprint, state) where the
+    fingerprint is (kind, text hash, keyboard hash), kind being 'text' or
+    'caption', and state hashes the message as Telegram returned it after
+    that edit. An entry is only trusted while the message a callback carries
+    still has that state, so edits made elsewhere (another worker, another
+    process on the same bot token) are never mistaken for ours.
+    """
+
+    SKIP = "skip"
+    MARKUP = "markup"
+    FULL = "full"
+
+    def __init__(self, maxsize: int = None):
+        super().__init__(maxsize or Config.SCREEN_FINGERPRINT_CACHE_SIZE)
+        self.skipped = 0
+        self.markup_only = 0
+        self.stale = 0
+
+    @staticmethod
+    def fingerprint(kind: str, text: str, parse_mode, reply_markup) -> Tuple:
+        return kind, hash((text, parse_mode)), markup_fingerprint(reply_markup)
+
+    @staticmethod
+    def message_state(message) -> Optional[int]:
+        """Hash of what a Message shows; None for no message (inline messages, edits returning True)"""
+        if message is None or isinstance(message, bool):
+            return None
+        photo = message.photo[-1].file_unique_id if message.photo else None
+        return hash((message.text, message.caption, photo, markup_fingerprint(message.reply_markup)))
+
+    def plan(self, key: Hashable, fingerprint: Tuple, message) -> str:
+        """Return SKIP if message already shows this, MARKUP if only the keyboard changed, else FULL"""
+        entry = self.get(key)
+        if entry is None:
+            return self.FULL
+        last, state = entry
+        if state != self.message_state(message):
+            # Edited since we last touched it, or we cannot tell
+            self.stale += 1
+            return self.FULL
+        if last == fingerprint:
+            self.skipped += 1
+            return self.SKIP
+        if last[:2] == fingerprint[:2]:
+            self.markup_only += 1
+            return self.MARKUP
+        return self.FULL
+
+    def record(self, key: Hashable, fingerprint: Tuple, message):
+        """Remember that message now shows fingerprint"""
+        state = self.message_state(message)
+        if state is None:
+            self.pop(key)
+        else:
+            self.put(key, (fingerprint, state))
+
+    def stats(self) -> Dict[str, float]:
+        stats = super().stats()
+        stats['skipped'] = self.skipped
+        stats['markup_only'] = self.markup_only
+        stats['stale'] = self.stale
+        return stats
+
+# Global render cache
+render_cache = RenderCache()
@@ -0,0 +1,88 @@
+import asyncio
+import itertools
+from typing import Awaitable, Callable, Dict, Hashable
+from config import Config
+
+class _Slot:
+    __slots__ = ('running', 'latest', 'idle', 'waiting')
+
+    def __init__(self):
+        # callback_data being handled for this message, or None
+        self.running = None
+        # sequence number of the newest press that may replace older ones
+        self.latest = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.waiting = 0
+
+class CallbackCoalescer:
+    """Single-flight and latest-wins scheduling of button presses, per message
+
+    Presses on one message run one at a time. A press whose callback_data is
+    already being handled for that message is merged into it. Presses marked
+    latest_wins (screens without side effects, such as page navigation) that
+    queue up behind another press are debounced: only the newest one runs and
+    the rest are dropped as superseded. A lone press runs immediately.
+    """
+
+    def __init__(self, debounce: float = None):
+        self.debounce = Config.CALLBACK_DEBOUNCE if debounce is None else debounce
+        self._slots: Dict[Hashable, _Slot] = {}
+        self._seq = itertools.count(1)
+        self.executed = 0
+        self.merged = 0
+        self.superseded = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    async def submit(self, key: Hashable, data: str, job: Callable[[], Awaitable],
+                     latest_wins: bool = False) -> bool:
+        """Run job for this press unless it is merged or superseded; True if it ran"""
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _Slot()
+        if slot.running == data:
+            self.merged += 1
+            return False
+
+        seq = next(self._seq)
+        if latest_wins:
+            slot.latest = seq
+        slot.waiting += 1
+        try:
+            waited = False
+            while slot.running is not None:
+                waited = True
+                await slot.idle.wait()
+            if latest_wins and slot.latest != seq:
+                self.superseded += 1
+                return False
+
+            slot.running = data
+            slot.idle.clear()
+            try:
+                if waited and latest_wins and self.debounce:
+                    # Part of a burst: let it settle and only render where it ended
+                    await asyncio.sleep(self.debounce)
+                    if slot.latest != seq:
+                        self.superseded += 1
+                        return False
+                self.executed += 1
+                await job()
+                return True
+            finally:
+                slot.running = None
+                slot.idle.set()
+        finally:
+            slot.waiting -= 1
+            if not slot.waiting and slot.running is None and self._slots.get(key) is slot:
+                del self._slots[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'executed': self.executed,
+            'merged': self.merged,
+            'superseded': self.superseded,
+            'active_messages': len(self._slots)
+        }
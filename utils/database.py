@@ -1,13 +1,437 @@
+import asyncio
+import bisect
+import copy
 import json
+import logging
 import os
-from typing import Dict, List, Optional
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 from config import Config
+from utils.metrics import STORAGE_SECONDS
+from utils.models import load_compact_airdrops
+from utils.search import SearchIndex
+from utils.session import SessionCache, UserSession
+from utils.journal import UserJournal, apply_drop_records, apply_reminder_records
+from utils.snapshot import load_snapshot_mapping
 from datetime import datetime  # Added missing import
 
+logger = logging.getLogger(__name__)
+
+class CatalogChange:
+    """IDs added, changed and removed between two catalog snapshots"""
+
+    __slots__ = ("version", "added", "changed", "removed", "base")
+
+    def __init__(self, added: List[str], changed: List[str], removed: List[str], base: Dict = None):
+        self.version = None
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        # The snapshot this diff was computed against
+        self.base = base
+
+    @classmethod
+    def diff(cls, old_by_id: Dict[str, Dict], new_by_id: Dict[str, Dict],
+             file_statuses: Dict[str, str] = None) -> "CatalogChange":
+        """Compare two snapshots; file_statuses maps ids whose live status was set
+        in place to the status their file gave them, so that status alone is not a change"""
+        file_statuses = file_statuses or {}
+        added, changed = [], []
+        for airdrop_id, airdrop in new_by_id.items():
+            old = old_by_id.get(airdrop_id)
+            if old is None:
+                added.append(airdrop_id)
+            elif old != airdrop:
+                if airdrop_id in file_statuses and airdrop.get("status") == file_statuses[airdrop_id] \
+                        and old == _with_status(airdrop, old.get("status")):
+                    continue
+                changed.append(airdrop_id)
+        removed = [airdrop_id for airdrop_id in old_by_id if airdrop_id not in new_by_id]
+        return cls(added, changed, removed, old_by_id)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def __repr__(self) -> str:
+        return (f"CatalogChange(version={self.version}, added={len(self.added)}, "
+                f"changed={len(self.changed)}, removed={len(self.removed)})")
+
+def _with_status(airdrop, status: str):
+    """Copy of a dict or Airdrop record with a different status"""
+    if isinstance(airdrop, dict):
+        return dict(airdrop, status=status)
+    airdrop = copy.copy(airdrop)
+    airdrop.status = status
+    return airdrop
+
+class CatalogIndex:
+    """Secondary indexes over the catalog, updated from the diff of each reload"""
+
+    FIELDS = ("status", "category", "difficulty")
+
+    def __init__(self):
+        self.order = []
+        self._by_field = {field: {} for field in self.FIELDS}
+        self._end_dates = []
+        self._views = {}
+
+    @staticmethod
+    def _end_date_key(airdrop: Dict):
+        end_date = airdrop.get("end_date")
+        try:
+            datetime.strptime(end_date, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            return None
+        return (end_date, airdrop["id"])
+
+    def _add(self, airdrop: Dict):
+        for field in self.FIELDS:
+            value = airdrop.get(field)
+            if value is not None:
+                self._by_field[field].setdefault(value, {})[airdrop["id"]] = None
+        key = self._end_date_key(airdrop)
+        if key:
+            bisect.insort(self._end_dates, key)
+
+    def _remove(self, airdrop: Dict):
+        for field in self.FIELDS:
+            value = airdrop.get(field)
+            bucket = self._by_field[field].get(value)
+            if bucket is not None:
+                bucket.pop(airdrop["id"], None)
+                if not bucket:
+                    del self._by_field[field][value]
+        key = self._end_date_key(airdrop)
+        if key:
+            i = bisect.bisect_left(self._end_dates, key)
+            if i < len(self._end_dates) and self._end_dates[i] == key:
+                del self._end_dates[i]
+
+    def update(self, old_by_id: Dict[str, Dict], new_by_id: Dict[str, Dict], change: CatalogChange):
+        """Apply the difference between two catalog snapshots"""
+        for airdrop_id in change.removed + change.changed:
+            self._remove(old_by_id[airdrop_id])
+        for airdrop_id in change.added + change.changed:
+            self._add(new_by_id[airdrop_id])
+        self.order = list(new_by_id)
+        self._views.clear()
+
+    def move(self, airdrop_id: str, field: str, old_value: str, new_value: str):
+        """Re-bucket one airdrop after a field changed in place"""
+        buckets = self._by_field[field]
+        bucket = buckets.get(old_value)
+        if bucket is not None:
+            bucket.pop(airdrop_id, None)
+            if not bucket:
+                del buckets[old_value]
+        if new_value is not None:
+            buckets.setdefault(new_value, {})[airdrop_id] = None
+        self._views.pop((field, old_value), None)
+        self._views.pop((field, new_value), None)
+
+    def ids_by(self, field: str, value: str) -> List[str]:
+        """IDs whose field equals value, in catalog order of insertion"""
+        key = (field, value)
+        ids = self._views.get(key)
+        if ids is None:
+            ids = list(self._by_field[field].get(value, ()))
+            self._views[key] = ids
+        return ids
+
+    def values(self, field: str) -> List[str]:
+        """Distinct values of an indexed field, sorted"""
+        return sorted(self._by_field[field])
+
+    def ids_ending_between(self, start: str = None, end: str = None) -> List[str]:
+        """IDs with start <= end_date <= end (YYYY-MM-DD), soonest first"""
+        lo = 0 if start is None else bisect.bisect_left(self._end_dates, (start,))
+        hi = len(self._end_dates) if end is None else bisect.bisect_right(self._end_dates, (end, "\uffff"))
+        return [airdrop_id for _, airdrop_id in self._end_dates[lo:hi]]
+
+def _write_status(by_id, airdrop_id: str, status: str):
+    if hasattr(by_id, "set_status"):
+        by_id.set_status(airdrop_id, status)
+    elif isinstance(by_id[airdrop_id], dict):
+        by_id[airdrop_id]["status"] = status
+    else:
+        by_id[airdrop_id].status = status
+
+class AirdropCatalog:
+    """In-memory copy of alldrops.json, reparsed only when the file changes
+
+    With Config.CATALOG_SNAPSHOT set, the catalog is instead read lazily from a
+    memory-mapped snapshot shared by every worker process.
+    """
+
+    def __init__(self, path: str = None, check_interval: float = None, snapshot_path: str = None):
+        self.snapshot_path = snapshot_path or Config.CATALOG_SNAPSHOT
+        self.path = self.snapshot_path or path or Config.ALLDROPS_FILE
+        self.check_interval = Config.CATALOG_CHECK_INTERVAL if check_interval is None else check_interval
+        self.version = 0
+        self._lock = threading.Lock()
+        self._data = {"airdrops": []}
+        self._by_id = {}
+        # airdrop_id -> file status, for airdrops whose status was set in place
+        self._file_statuses = {}
+        self.index = CatalogIndex()
+        self.search_index = SearchIndex()
+        self._stamp = None
+        self._checked_at = 0.0
+        self._loaded = False
+        self._subscribers = []
+        self.watching = False
+        self.rejected = 0
+
+    def _file_stamp(self):
+        """Return (mtime_ns, size) of the catalog file, or None if missing"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload the catalog if the file changed; return True on reload
+
+        While a CatalogWatcher is running it does the reloading in the
+        background, so this only loads the catalog the first time.
+        """
+        if self.watching and self._loaded and not force:
+            return False
+        now = time.monotonic()
+        if not force and self._loaded and now - self._checked_at < self.check_interval:
+            return False
+
+        with self._lock:
+            self._checked_at = now
+            stamp = self._file_stamp()
+            if not force and self._loaded and stamp == self._stamp:
+                return False
+            by_id = self.load(stamp)
+            if by_id is None:
+                self.reject(stamp)
+                return False
+            change = self._apply(stamp, by_id, CatalogChange.diff(self._by_id, by_id, self._file_statuses))
+        self._publish(change)
+        return True
+
+    def load(self, stamp) -> Optional[Dict[str, Dict]]:
+        """Parse the catalog file; None if it is malformed or vanished after a good load"""
+        if stamp is None:
+            if self._by_id:
+                logger.warning(f"{self.path} is missing, keeping the last good catalog")
+                return None
+            return {}
+        started = time.perf_counter()
+        try:
+            if self.snapshot_path:
+                by_id = load_snapshot_mapping(self.path)
+            else:
+                by_id = {airdrop["id"]: airdrop for airdrop in load_compact_airdrops(self.path)}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Could not load {self.path}, keeping the last good catalog: {e}")
+            return None
+        STORAGE_SECONDS.observe("catalog_parse", time.perf_counter() - started)
+        return by_id
+
+    def reject(self, stamp):
+        """Remember a bad file's stamp so it is not parsed again until it changes"""
+        self._stamp = stamp
+        self._loaded = True
+        self.rejected += 1
+
+    def prepare_reload(self):
+        """Parse and diff a changed file without touching the live catalog
+
+        Returns (stamp, by_id, change) for apply(), or None if the file is
+        unchanged or malformed. Safe to call from a background thread.
+        """
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return None
+        by_id = self.load(stamp)
+        if by_id is None:
+            self.reject(stamp)
+            return None
+        return stamp, by_id, CatalogChange.diff(self._by_id, by_id, dict(self._file_statuses))
+
+    def apply(self, stamp, by_id: Dict[str, Dict], change: CatalogChange = None) -> CatalogChange:
+        """Swap in a loaded catalog and notify subscribers
+
+        Readers on the thread calling this never see a half-updated catalog;
+        the watcher calls it on the event loop for that reason.
+        """
+        with self._lock:
+            if change is None or change.base is not self._by_id:
+                # Diffed against a catalog that has since been replaced
+                change = CatalogChange.diff(self._by_id, by_id, self._file_statuses)
+            change = self._apply(stamp, by_id, change)
+        self._publish(change)
+        return change
+
+    def _apply(self, stamp, by_id: Dict[str, Dict], change: CatalogChange) -> CatalogChange:
+        started = time.perf_counter()
+        # Statuses set in place survive on records the file did not change;
+        # whoever set them re-derives the changed ones from the change
+        stale = set(change.changed)
+        stale.update(change.removed)
+        carried = [(airdrop_id, self._by_id[airdrop_id].get("status"))
+                   for airdrop_id in self._file_statuses if airdrop_id not in stale]
+        for airdrop_id in stale:
+            self._file_statuses.pop(airdrop_id, None)
+        self.index.update(self._by_id, by_id, change)
+        self.search_index.update(self._by_id, by_id, change)
+        for airdrop_id, status in carried:
+            _write_status(by_id, airdrop_id, status)
+        self._data = None
+        self._by_id = by_id
+        self._stamp = stamp
+        self._loaded = True
+        self.version += 1
+        change.version = self.version
+        change.base = None
+        STORAGE_SECONDS.observe("catalog_reload", time.perf_counter() - started)
+        return change
+
+    def subscribe(self, callback: Callable[[CatalogChange], None]):
+        """Call callback(change) after every reload, on the thread that applied it"""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[CatalogChange], None]):
+        self._subscribers.remove(callback)
+
+    def _publish(self, change: CatalogChange):
+        logger.info(f"Catalog reloaded: {change}")
+        for callback in list(self._subscribers):
+            try:
+                callback(change)
+            except Exception:
+                logger.exception(f"Catalog subscriber {callback!r} failed")
+
+    def invalidate(self):
+        """Force a reload on next access"""
+        self._loaded = False
+
+    def get_data(self) -> Dict:
+        """Return the parsed catalog (shared, do not mutate)"""
+        self.refresh()
+        if self._data is None:
+            self._data = {"airdrops": list(self._by_id.values())}
+        return self._data
+
+    def get_airdrops(self) -> List[Dict]:
+        """Return the list of airdrops (shared, do not mutate)"""
+        return self.get_data().get("airdrops", [])
+
+    def get(self, airdrop_id: str) -> Optional[Dict]:
+        """Look up an airdrop by ID"""
+        self.refresh()
+        return self._by_id.get(airdrop_id)
+
+    def get_version(self) -> int:
+        """Return a counter that changes whenever the catalog is reloaded"""
+        self.refresh()
+        return self.version
+
+    def all_ids(self) -> List[str]:
+        """Every airdrop ID in file order"""
+        self.refresh()
+        return self.index.order
+
+    def ids_by_status(self, status: str) -> List[str]:
+        """IDs of airdrops with the given status"""
+        self.refresh()
+        return self.index.ids_by("status", status)
+
+    def ids_by_category(self, category: str) -> List[str]:
+        """IDs of airdrops in the given category"""
+        self.refresh()
+        return self.index.ids_by("category", category)
+
+    def ids_by_difficulty(self, difficulty: str) -> List[str]:
+        """IDs of airdrops with the given difficulty"""
+        self.refresh()
+        return self.index.ids_by("difficulty", difficulty)
+
+    def categories(self) -> List[str]:
+        """Distinct categories, sorted"""
+        self.refresh()
+        return self.index.values("category")
+
+    def ids_ending_between(self, start: str = None, end: str = None) -> List[str]:
+        """IDs ending within [start, end], soonest first"""
+        self.refresh()
+        return self.index.ids_ending_between(start, end)
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """IDs of airdrops matching a free-text query, best first"""
+        self.refresh()
+        return [airdrop_id for airdrop_id, _ in self.search_index.search(query, limit)]
+
+    @property
+    def stamp(self):
+        """(mtime_ns, size) of the file the current catalog was loaded from"""
+        return self._stamp
+
+    def items(self) -> Iterable[Tuple[str, Dict]]:
+        """(id, airdrop) pairs of the current catalog"""
+        self.refresh()
+        return self._by_id.items()
+
+    def set_status(self, airdrop_id: str, status: str) -> Optional[str]:
+        """Change one airdrop's status in place and re-index it; returns the old status
+
+        Used for derived statuses, so it does not bump the catalog version.
+        Holds the reload lock, as reloads may be applied on another thread.
+        """
+        with self._lock:
+            airdrop = self._by_id.get(airdrop_id)
+            if airdrop is None:
+                return None
+            old_status = airdrop.get("status")
+            if old_status == status:
+                return old_status
+            if self._file_statuses.setdefault(airdrop_id, old_status) == status:
+                del self._file_statuses[airdrop_id]
+            _write_status(self._by_id, airdrop_id, status)
+            self._data = None
+            self.index.move(airdrop_id, "status", old_status, status)
+            return old_status
+
+    def resolve(self, airdrop_ids: Iterable[str]) -> List[Dict]:
+        """Map IDs to airdrops, skipping unknown ones"""
+        by_id = self._by_id
+        return [by_id[airdrop_id] for airdrop_id in airdrop_ids if airdrop_id in by_id]
+
 class DatabaseManager:
     def __init__(self):
+        self.catalog = AirdropCatalog()
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.STORAGE_WORKERS,
+            thread_name_prefix="storage"
+        )
+        self._pending_lock = threading.Lock()
+        self._user_locks = weakref.WeakValueDictionary()
+        self._dirty_drops = {}
+        self._flush_tasks = {}
+        self.sessions = SessionCache()
+        self.journal = None
+        self._users = None
+        self._users_lock = threading.Lock()
+        self.initialized = False
+    
+    def init(self):
+        """Create the data directories and sample catalog; safe to call more than once"""
+        if self.initialized:
+            return
         self.ensure_directories()
         self.ensure_files()
+        self.open_journal()
+        self.initialized = True
     
     def ensure_directories(self):
         """Create necessary directories if they don't exist"""
@@ -15,7 +439,8 @@ class DatabaseManager:
             Config.DATA_DIR,
             Config.BANNERS_DIR,
             Config.USER_DROPS_DIR,
-            Config.REMINDERS_DIR
+            Config.REMINDERS_DIR,
+            Config.BROADCASTS_DIR
         ]
         for directory in directories:
             os.makedirs(directory, exist_ok=True)
@@ -25,6 +450,31 @@ class DatabaseManager:
         if not os.path.exists(Config.ALLDROPS_FILE):
             self.create_sample_airdrops()
     
+    def open_journal(self):
+        """Replay any journal left by a crash into the user files, then log changes to a fresh one"""
+        if not Config.USER_JOURNAL:
+            return
+        journal = UserJournal(Config.JOURNAL_FILE, self._fold_journal)
+        if not journal.open():
+            # Another worker owns this journal; replaying or compacting it here would lose its records
+            logger.info(f"{Config.JOURNAL_FILE} is held by another process; writing user files directly")
+            return
+        self.journal = journal
+        journal.start()
+    
+    def _fold_journal(self, by_user: Dict[str, List[Dict]]):
+        """Apply journal records to the user files, rewriting each touched file once"""
+        for username, records in by_user.items():
+            drop_records = [record for record in records if record["op"] in ("add", "remove")]
+            if drop_records:
+                self.write_user_drops(username, apply_drop_records(self._read_user_drops(username), drop_records))
+            reminder_records = [record for record in records if record["op"] in ("reminder", "done")]
+            if reminder_records:
+                reminders = apply_reminder_records(self._read_user_reminders(username), reminder_records)
+                # Delivered reminders are dropped here, so reminder files stop growing
+                reminders = [reminder for reminder in reminders if reminder.get("status", "pending") != "sent"]
+                self._write_json_atomic(self._reminders_path(username), {"reminders": reminders})
+    
     def create_sample_airdrops(self):
         """Create sample airdrops data"""
         sample_data = {
@@ -73,27 +523,34 @@ class DatabaseManager:
             ]
         }
         
-        with open(Config.ALLDROPS_FILE, 'w') as f:
+        with open(Config.ALLDROPS_FILE, 'w', encoding='utf-8') as f:
             json.dump(sample_data, f, indent=2)
+        self.catalog.invalidate()
     
     def load_all_airdrops(self) -> Dict:
-        """Load all airdrops from JSON file"""
-        try:
-            with open(Config.ALLDROPS_FILE, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {"airdrops": []}
+        """Load all airdrops from the cached catalog"""
+        return self.catalog.get_data()
     
     def get_airdrop_by_id(self, airdrop_id: str) -> Optional[Dict]:
         """Get specific airdrop by ID"""
-        data = self.load_all_airdrops()
-        for airdrop in data.get("airdrops", []):
-            if airdrop["id"] == airdrop_id:
-                return airdrop
-        return None
+        return self.catalog.get(airdrop_id)
     
-    def load_user_drops(self, username: str) -> List[str]:
-        """Load user's saved airdrops"""
+    @property
+    def catalog_version(self) -> int:
+        """Version of the airdrop catalog, bumped on every reload"""
+        return self.catalog.get_version()
+    
+    def _write_json_atomic(self, file_path: str, data: Dict):
+        """Write JSON to a temp file and rename it over the target"""
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+            if Config.FSYNC_WRITES:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    
+    def _read_user_drops(self, username: str) -> List[str]:
         file_path = os.path.join(Config.USER_DROPS_DIR, f"{username}.json")
         try:
             with open(file_path, 'r') as f:
@@ -102,57 +559,361 @@ class DatabaseManager:
         except FileNotFoundError:
             return []
     
+    def load_user_drops(self, username: str) -> List[str]:
+        """Load user's saved airdrops"""
+        if self.journal is None:
+            return self._read_user_drops(username)
+        # Take the journal overlay first: records folded meanwhile are then replayed twice, harmlessly
+        records = self.journal.records_for(username)
+        return apply_drop_records(self._read_user_drops(username), records)
+    
+    def write_user_drops(self, username: str, user_drops: List[str]):
+        """Replace user's saved airdrops"""
+        file_path = os.path.join(Config.USER_DROPS_DIR, f"{username}.json")
+        self._write_json_atomic(file_path, {"airdrops": user_drops})
+    
     def save_user_drop(self, username: str, airdrop_id: str):
         """Save airdrop to user's list"""
-        file_path = os.path.join(Config.USER_DROPS_DIR, f"{username}.json")
+        if self.journal is not None:
+            self.journal.append({"op": "add", "user": username, "airdrop_id": airdrop_id})
+            return
         user_drops = self.load_user_drops(username)
         
         if airdrop_id not in user_drops:
             user_drops.append(airdrop_id)
-            
-            data = {"airdrops": user_drops}
-            with open(file_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            self.write_user_drops(username, user_drops)
     
     def remove_user_drop(self, username: str, airdrop_id: str):
         """Remove airdrop from user's list"""
-        file_path = os.path.join(Config.USER_DROPS_DIR, f"{username}.json")
+        if self.journal is not None:
+            self.journal.append({"op": "remove", "user": username, "airdrop_id": airdrop_id})
+            return
         user_drops = self.load_user_drops(username)
         
         if airdrop_id in user_drops:
             user_drops.remove(airdrop_id)
-            
-            data = {"airdrops": user_drops}
-            with open(file_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            self.write_user_drops(username, user_drops)
     
-    def load_user_reminders(self, username: str) -> List[Dict]:
-        """Load user's reminders"""
-        file_path = os.path.join(Config.REMINDERS_DIR, f"{username}_reminders.json")
+    def _reminders_path(self, username: str) -> str:
+        return os.path.join(Config.REMINDERS_DIR, f"{username}_reminders.json")
+    
+    def _read_user_reminders(self, username: str) -> List[Dict]:
         try:
-            with open(file_path, 'r') as f:
+            with open(self._reminders_path(username), 'r') as f:
                 data = json.load(f)
                 return data.get("reminders", [])
         except FileNotFoundError:
             return []
     
-    def save_user_reminder(self, username: str, airdrop_id: str, remind_time: str, frequency: str):
+    def load_user_reminders(self, username: str) -> List[Dict]:
+        """Load user's reminders"""
+        if self.journal is None:
+            return self._read_user_reminders(username)
+        records = self.journal.records_for(username)
+        return apply_reminder_records(self._read_user_reminders(username), records)
+    
+    def save_user_reminder(self, username: str, airdrop_id: str, remind_time: str, frequency: str,
+                           due_at: float = None, chat_id: int = None) -> Dict:
         """Save user reminder"""
-        file_path = os.path.join(Config.REMINDERS_DIR, f"{username}_reminders.json")
-        reminders = self.load_user_reminders(username)
-        
         reminder = {
+            "id": uuid.uuid4().hex,
             "airdrop_id": airdrop_id,
             "remind_time": remind_time,
             "frequency": frequency,
-            "created_at": str(datetime.now())
+            "created_at": str(datetime.now()),
+            "due_at": due_at,
+            "chat_id": chat_id,
+            "status": "pending"
         }
         
-        reminders.append(reminder)
+        if self.journal is not None:
+            self.journal.append({"op": "reminder", "user": username, "reminder": reminder})
+        else:
+            reminders = self._read_user_reminders(username)
+            reminders.append(reminder)
+            self._write_json_atomic(self._reminders_path(username), {"reminders": reminders})
+        
+        if due_at is not None:
+            with self._pending_lock:
+                with open(Config.PENDING_REMINDERS_FILE, 'a') as f:
+                    f.write(json.dumps(dict(reminder, username=username), separators=(',', ':')) + "\n")
+        return reminder
+    
+    def load_pending_reminders(self) -> List[Dict]:
+        """Load every undelivered reminder from the pending index, compacting it"""
+        pending = {}
+        with self._pending_lock:
+            try:
+                with open(Config.PENDING_REMINDERS_FILE, 'r') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if "done" in entry:
+                            pending.pop(entry["done"], None)
+                        else:
+                            pending[entry["id"]] = entry
+            except FileNotFoundError:
+                return []
+            
+            tmp_path = Config.PENDING_REMINDERS_FILE + ".tmp"
+            with open(tmp_path, 'w') as f:
+                for entry in pending.values():
+                    f.write(json.dumps(entry, separators=(',', ':')) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, Config.PENDING_REMINDERS_FILE)
+        return list(pending.values())
+    
+    def mark_reminder_delivered(self, username: str, reminder_id: str):
+        """Flag a reminder as sent and drop it from the pending index"""
+        if self.journal is not None:
+            self.journal.append({"op": "done", "user": username, "reminder_id": reminder_id})
+        else:
+            reminders = self._read_user_reminders(username)
+            for reminder in reminders:
+                if reminder.get("id") == reminder_id:
+                    reminder["status"] = "sent"
+            self._write_json_atomic(self._reminders_path(username), {"reminders": reminders})
         
-        data = {"reminders": reminders}
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        with self._pending_lock:
+            with open(Config.PENDING_REMINDERS_FILE, 'a') as f:
+                f.write(json.dumps({"done": reminder_id}, separators=(',', ':')) + "\n")
+
+    def _load_user_registry(self) -> Dict[str, int]:
+        """Read the username -> chat_id registry into memory once"""
+        if self._users is None:
+            users = {}
+            try:
+                with open(Config.USERS_FILE, 'r') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        users[entry["username"]] = entry["chat_id"]
+            except FileNotFoundError:
+                pass
+            self._users = users
+        return self._users
+    
+    def is_user_registered(self, username: str, chat_id: int) -> bool:
+        """True if the registry already maps username to chat_id (memory only)"""
+        return self._users is not None and self._users.get(username) == chat_id
+    
+    def register_user(self, username: str, chat_id: int) -> bool:
+        """Record the chat a user can be messaged in; returns True if it changed"""
+        with self._users_lock:
+            users = self._load_user_registry()
+            if users.get(username) == chat_id:
+                return False
+            users[username] = chat_id
+            with open(Config.USERS_FILE, 'a') as f:
+                f.write(json.dumps({"username": username, "chat_id": chat_id}, separators=(',', ':')) + "\n")
+        return True
+    
+    def list_users(self) -> List[Tuple[str, int]]:
+        """Every known (username, chat_id)"""
+        with self._users_lock:
+            return list(self._load_user_registry().items())
+    
+    def users_with_drops(self, airdrop_ids: Iterable[str]) -> Set[str]:
+        """Usernames whose wishlist contains any of the given airdrops"""
+        wanted = set(airdrop_ids)
+        usernames = set()
+        with os.scandir(Config.USER_DROPS_DIR) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                username = entry.name[:-len(".json")]
+                if wanted.intersection(self.load_user_drops(username)):
+                    usernames.add(username)
+        if self.journal is not None:
+            # Users whose first wishlist change has not been folded into a file yet
+            for username in self.journal.users():
+                if username not in usernames and wanted.intersection(self.load_user_drops(username)):
+                    usernames.add(username)
+        return usernames
+    
+    async def _run_in_executor(self, func, *args):
+        """Run a blocking storage call on the storage thread pool"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            STORAGE_SECONDS.observe(func.__name__, time.perf_counter() - started)
+    
+    def user_lock(self, username: str) -> asyncio.Lock:
+        """Return the asyncio lock serialising writes for one user"""
+        lock = self._user_locks.get(username)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._user_locks[username] = lock
+        return lock
+    
+    async def _session(self, username: str, part: str, load) -> UserSession:
+        """Return the user's session with part ('drops' or 'reminders') loaded; call under user_lock"""
+        session = self.sessions.get(username)
+        if session is None:
+            session = UserSession()
+        if getattr(session, part) is None:
+            value = await load()
+            # Another reader may have filled it in while we waited on storage
+            if getattr(session, part) is None:
+                setattr(session, part, value)
+            if Config.SESSION_CACHE:
+                self.sessions.put(username, session)
+        return session
+    
+    async def _load_drops_set(self, username: str) -> Dict[str, None]:
+        if username in self._dirty_drops:
+            return dict.fromkeys(self._dirty_drops[username])
+        return dict.fromkeys(await self._run_in_executor(self.load_user_drops, username))
+    
+    async def _user_drops(self, username: str) -> Dict[str, None]:
+        session = await self._session(username, 'drops', lambda: self._load_drops_set(username))
+        return session.drops
+    
+    async def load_user_drops_async(self, username: str) -> List[str]:
+        """Awaitable version of load_user_drops, served from the session cache"""
+        async with self.user_lock(username):
+            return list(await self._user_drops(username))
+    
+    async def is_wishlisted_async(self, username: str, airdrop_id: str) -> bool:
+        """True if the airdrop is in the user's wishlist; a set lookup once the session is loaded"""
+        session = self.sessions.get(username)
+        if session is not None and session.drops is not None:
+            return airdrop_id in session.drops
+        async with self.user_lock(username):
+            return airdrop_id in await self._user_drops(username)
+    
+    async def _stage_user_drops(self, username: str, user_drops: List[str]):
+        """Buffer a wishlist change and flush it once the write-behind window ends"""
+        self._dirty_drops[username] = user_drops
+        if username not in self._flush_tasks:
+            self._flush_tasks[username] = asyncio.get_running_loop().create_task(
+                self._delayed_flush(username)
+            )
+    
+    async def _delayed_flush(self, username: str):
+        await asyncio.sleep(Config.WRITE_BEHIND_WINDOW)
+        self._flush_tasks.pop(username, None)
+        await self._flush_user_drops(username)
+    
+    async def _flush_user_drops(self, username: str):
+        async with self.user_lock(username):
+            user_drops = self._dirty_drops.get(username)
+            if user_drops is None:
+                return
+            try:
+                await self._run_in_executor(self.write_user_drops, username, user_drops)
+            except Exception as e:
+                # Leave the change buffered so the next flush retries it
+                logger.error(f"Error flushing wishlist for {username}: {e}")
+                return
+            # Unbuffer only after the write so readers never see the old file
+            del self._dirty_drops[username]
+    
+    async def save_user_drop_async(self, username: str, airdrop_id: str):
+        """Add airdrop to user's list through the session and the write-behind buffer"""
+        async with self.user_lock(username):
+            user_drops = await self._user_drops(username)
+            if airdrop_id not in user_drops:
+                if self.journal is not None or Config.WRITE_BEHIND_WINDOW <= 0:
+                    # One add rather than the whole list, so other processes' changes survive
+                    await self._run_in_executor(self.save_user_drop, username, airdrop_id)
+                    user_drops[airdrop_id] = None
+                else:
+                    user_drops[airdrop_id] = None
+                    await self._stage_user_drops(username, list(user_drops))
+                self.sessions.resize(username)
+    
+    async def remove_user_drop_async(self, username: str, airdrop_id: str):
+        """Remove airdrop from user's list through the session and the write-behind buffer"""
+        async with self.user_lock(username):
+            user_drops = await self._user_drops(username)
+            if airdrop_id in user_drops:
+                if self.journal is not None or Config.WRITE_BEHIND_WINDOW <= 0:
+                    await self._run_in_executor(self.remove_user_drop, username, airdrop_id)
+                    del user_drops[airdrop_id]
+                else:
+                    del user_drops[airdrop_id]
+                    await self._stage_user_drops(username, list(user_drops))
+                self.sessions.resize(username)
+    
+    async def flush_async(self):
+        """Write out every buffered wishlist change now"""
+        for task in list(self._flush_tasks.values()):
+            task.cancel()
+        self._flush_tasks.clear()
+        for username in list(self._dirty_drops):
+            await self._flush_user_drops(username)
+    
+    async def load_user_reminders_async(self, username: str) -> List[Dict]:
+        """Awaitable version of load_user_reminders, served from the session cache"""
+        async with self.user_lock(username):
+            session = await self._session(
+                username, 'reminders', lambda: self._run_in_executor(self.load_user_reminders, username)
+            )
+            return list(session.reminders)
+    
+    async def save_user_reminder_async(self, username: str, airdrop_id: str, remind_time: str, frequency: str,
+                                       due_at: float = None, chat_id: int = None) -> Dict:
+        """Awaitable version of save_user_reminder; keeps a cached session in step"""
+        async with self.user_lock(username):
+            reminder = await self._run_in_executor(
+                self.save_user_reminder, username, airdrop_id, remind_time, frequency, due_at, chat_id
+            )
+            session = self.sessions.peek(username)
+            if session is not None and session.reminders is not None:
+                session.reminders.append(reminder)
+                self.sessions.resize(username)
+            return reminder
+    
+    async def load_pending_reminders_async(self) -> List[Dict]:
+        """Awaitable version of load_pending_reminders"""
+        return await self._run_in_executor(self.load_pending_reminders)
+    
+    async def mark_reminder_delivered_async(self, username: str, reminder_id: str):
+        """Awaitable version of mark_reminder_delivered"""
+        async with self.user_lock(username):
+            await self._run_in_executor(self.mark_reminder_delivered, username, reminder_id)
+            session = self.sessions.peek(username)
+            if session is not None and session.reminders is not None:
+                session.reminders = [
+                    dict(reminder, status="sent") if reminder.get("id") == reminder_id else reminder
+                    for reminder in session.reminders
+                ]
+    
+    async def register_user_async(self, username: str, chat_id: int):
+        """Awaitable version of register_user; free when the user is already known"""
+        if not self.is_user_registered(username, chat_id):
+            await self._run_in_executor(self.register_user, username, chat_id)
+    
+    async def list_users_async(self) -> List[Tuple[str, int]]:
+        """Awaitable version of list_users"""
+        return await self._run_in_executor(self.list_users)
+    
+    async def users_with_drops_async(self, airdrop_ids: Iterable[str]) -> Set[str]:
+        """Awaitable version of users_with_drops"""
+        return await self._run_in_executor(self.users_with_drops, list(airdrop_ids))
+    
+    def shutdown(self):
+        """Wait for pending storage calls, stop the thread pool and fold the journal"""
+        self._executor.shutdown(wait=True)
+        if self.journal is not None:
+            self.journal.close()
+
+def create_database_manager() -> DatabaseManager:
+    """Build the storage backend selected by Config.STORAGE_BACKEND"""
+    if Config.STORAGE_BACKEND == "sqlite":
+        from utils.sqlite_backend import SQLiteDatabaseManager
+        return SQLiteDatabaseManager()
+    if Config.STORAGE_BACKEND == "json":
+        return DatabaseManager()
+    raise ValueError(f"Unknown storage backend: {Config.STORAGE_BACKEND}")
 
-# Global database instance
-db = DatabaseManager()
+# Global database instance; touches nothing on disk until db.init()
+db = create_database_manager()
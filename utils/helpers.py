@@ -50,13 +50,14 @@ class MessageFormatter:
         }
         
         emoji = status_emoji.get(airdrop.get('status', 'active'), '🟢')
+        description = airdrop.get('description', '')
         diff_emoji = difficulty_emoji.get(airdrop.get('difficulty', 'Easy'), '🟢')
         
         return f"{emoji} **{airdrop['title']}**\n" \
                f"💰 Reward: {airdrop.get('reward', 'TBA')}\n" \
                f"{diff_emoji} Difficulty: {airdrop.get('difficulty', 'Easy')}\n" \
                f"📅 Ends: {airdrop.get('end_date', 'TBA')}\n" \
-               f"📝 {airdrop['description'][:100]}{'...' if len(airdrop['description']) > 100 else ''}"
+               f"📝 {description[:100]}{'...' if len(description) > 100 else ''}"
     
     @staticmethod
     def format_airdrop_detail(airdrop: Dict) -> str:
@@ -74,7 +75,7 @@ class MessageFormatter:
         message += f"💰 Reward: {airdrop.get('reward', 'TBA')}\n"
         message += f"⚡ Difficulty: {airdrop.get('difficulty', 'Easy')}\n"
         message += f"📅 End Date: {airdrop.get('end_date', 'TBA')}\n\n"
-        message += f"📝 **Description:**\n{airdrop['description']}\n\n"
+        message += f"📝 **Description:**\n{airdrop.get('description', '')}\n\n"
         
         if airdrop.get('tasks'):
             message += "✅ **Tasks:**\n"
@@ -153,6 +154,3 @@ pagination = PaginationHelper()
 formatter = MessageFormatter()
 file_helper = FileHelper()
 validator = ValidationHelper()
-
-# Create sample banner files on import
-file_helper.create_sample_banner_files()
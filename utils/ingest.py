@@ -0,0 +1,257 @@
+import csv
+import json
+import os
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from config import Config
+from utils.models import iter_airdrops
+
+STATUSES = ('active', 'hot', 'ending_soon', 'expired')
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+TEXT_FIELDS = ('description', 'category', 'reward', 'difficulty', 'banner')
+ID_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+class RecordError(ValueError):
+    """A feed record that does not match the airdrop schema"""
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise RecordError(f"expected text: got {type(value).__name__}")
+    return value.strip() or None
+
+def _parse_links(raw: Dict) -> Dict[str, str]:
+    links = raw.get('links')
+    if isinstance(links, str):
+        try:
+            links = json.loads(links) if links.strip() else {}
+        except ValueError:
+            raise RecordError("links is not a JSON object")
+    if links is not None and not isinstance(links, dict):
+        raise RecordError("links must be an object")
+    links = dict(links or {})
+    # CSV feeds spell links as links.website, links.twitter, ...
+    for key, value in raw.items():
+        if key.startswith('links.') and value:
+            links[key[6:]] = value
+    for name, url in links.items():
+        if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+            raise RecordError(f"link is not an http(s) URL: {name}")
+    return links
+
+def _parse_tasks(value) -> List[str]:
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith('['):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise RecordError("tasks is not a JSON array")
+        else:
+            value = value.split('|')
+    if not isinstance(value, list) or not all(isinstance(task, str) for task in value):
+        raise RecordError("tasks must be a list of strings")
+    return [task.strip() for task in value if task.strip()]
+
+def normalize_record(raw: Dict) -> Dict:
+    """Validate a feed record and return it in catalog form; raises RecordError"""
+    if not isinstance(raw, dict):
+        raise RecordError("record is not an object")
+
+    airdrop_id = _text(raw.get('id'))
+    if not airdrop_id or not ID_PATTERN.match(airdrop_id):
+        raise RecordError("missing or invalid id")
+    title = _text(raw.get('title'))
+    if not title:
+        raise RecordError("missing title")
+
+    # Left unset when the feed omits it, so a merge keeps the current status
+    status = _text(raw.get('status'))
+    if status is not None:
+        status = status.lower().replace(' ', '_')
+        if status not in STATUSES:
+            raise RecordError(f"unknown status: {status}")
+
+    end_date = _text(raw.get('end_date'))
+    try:
+        datetime.strptime(end_date or '', '%Y-%m-%d')
+    except ValueError:
+        raise RecordError("end_date must be YYYY-MM-DD")
+
+    record = {'id': airdrop_id, 'title': title}
+    if status is not None:
+        record['status'] = status
+    record['end_date'] = end_date
+    for field in TEXT_FIELDS:
+        value = _text(raw.get(field))
+        if value is not None:
+            record[field] = value
+    if 'difficulty' in record:
+        record['difficulty'] = record['difficulty'].capitalize()
+        if record['difficulty'] not in DIFFICULTIES:
+            raise RecordError(f"unknown difficulty: {record['difficulty']}")
+    record['links'] = _parse_links(raw)
+    record['tasks'] = _parse_tasks(raw.get('tasks'))
+    return record
+
+def merge_records(old: Dict, new: Dict) -> Dict:
+    """Overlay a newer record on an older one; empty fields keep the old value"""
+    merged = dict(old)
+    for field, value in new.items():
+        if field == 'links':
+            merged['links'] = {**(old.get('links') or {}), **value}
+        elif value not in (None, '', []):
+            merged[field] = value
+    return merged
+
+def process_chunk(kind: str, source: str, first_line: int, items: list) -> Tuple[List[Dict], List[Tuple]]:
+    """Parse and validate one chunk of a feed; runs in the worker processes"""
+    records, rejects = [], []
+    for offset, item in enumerate(items):
+        try:
+            if kind == 'jsonl':
+                try:
+                    item = json.loads(item)
+                except ValueError as e:
+                    raise RecordError(f"invalid JSON: {e}")
+            records.append(normalize_record(item))
+        except RecordError as e:
+            rejects.append((source, first_line + offset, str(e)))
+    return records, rejects
+
+def feed_kind(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f"{path}: expected a .csv, .jsonl or .ndjson feed")
+
+def iter_chunks(path: str, chunk_size: int) -> Iterator[Tuple[str, str, int, list]]:
+    """Stream a feed as (kind, source, first_line, items) chunks"""
+    kind = feed_kind(path)
+    with open(path, 'r', newline='' if kind == 'csv' else None, encoding='utf-8') as f:
+        if kind == 'csv':
+            reader = csv.DictReader(f)
+            rows, first_line = [], 2
+            for row in reader:
+                rows.append({key: value for key, value in row.items() if key is not None})
+                if len(rows) >= chunk_size:
+                    yield kind, path, first_line, rows
+                    rows, first_line = [], reader.line_num + 1
+            if rows:
+                yield kind, path, first_line, rows
+        else:
+            lines, first_line = [], 1
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                if not lines:
+                    first_line = line_no
+                lines.append(line)
+                if len(lines) >= chunk_size:
+                    yield kind, path, first_line, lines
+                    lines = []
+            if lines:
+                yield kind, path, first_line, lines
+
+def load_existing_catalog(path: str) -> Dict[str, Dict]:
+    """Read the current catalog as plain dicts; an empty or missing file is an empty catalog"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return {}
+    # A malformed catalog raises here rather than being overwritten
+    return {airdrop['id']: airdrop for airdrop in iter_airdrops(path)}
+
+def write_catalog(path: str, airdrops: Iterable[Dict]):
+    """Atomically replace the catalog file, one airdrop per line"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('{"airdrops": [\n')
+        for i, airdrop in enumerate(airdrops):
+            if i:
+                f.write(',\n')
+            f.write(json.dumps(airdrop, ensure_ascii=False, separators=(',', ':')))
+        f.write('\n]}\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def ingest(paths: List[str], output: str = None, merge_existing: bool = True, workers: int = None,
+           chunk_size: int = 2000, dry_run: bool = False, rejects_path: str = None) -> Dict:
+    """Validate feeds in parallel, merge them into the catalog by id and write it"""
+    output = output or Config.ALLDROPS_FILE
+    if workers is None:
+        workers = os.cpu_count() or 1
+    started = time.perf_counter()
+
+    catalog = load_existing_catalog(output) if merge_existing else {}
+    existing = len(catalog)
+    stats = Counter()
+    reasons = Counter()
+    rejects_file = open(rejects_path, 'w', encoding='utf-8') if rejects_path else None
+
+    def collect(result):
+        records, rejects = result
+        for record in records:
+            old = catalog.get(record['id'])
+            if old is None:
+                record.setdefault('status', 'active')
+                catalog[record['id']] = record
+                stats['added'] += 1
+            else:
+                catalog[record['id']] = merge_records(old, record)
+                stats['merged'] += 1
+        for source, line, reason in rejects:
+            reasons[reason.split(':')[0]] += 1
+            if rejects_file:
+                rejects_file.write(json.dumps({'source': source, 'line': line, 'reason': reason}) + '\n')
+        stats['accepted'] += len(records)
+        stats['rejected'] += len(rejects)
+
+    try:
+        chunks = (chunk for path in paths for chunk in iter_chunks(path, chunk_size))
+        if workers <= 1:
+            for chunk in chunks:
+                collect(process_chunk(*chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Bounded in-flight window keeps memory flat; results are merged in input order
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(process_chunk, *chunk))
+                    if len(pending) >= workers * 2:
+                        collect(pending.popleft().result())
+                while pending:
+                    collect(pending.popleft().result())
+    finally:
+        if rejects_file:
+            rejects_file.close()
+
+    if not dry_run:
+        write_catalog(output, catalog.values())
+
+    elapsed = time.perf_counter() - started
+    records = stats['accepted'] + stats['rejected']
+    return {
+        'records': records,
+        'accepted': stats['accepted'],
+        'rejected': stats['rejected'],
+        'added': stats['added'],
+        'merged': stats['merged'],
+        'existing': existing,
+        'catalog_size': len(catalog),
+        'reject_reasons': dict(reasons.most_common()),
+        'elapsed': round(elapsed, 3),
+        'records_per_second': round(records / elapsed, 1) if elapsed else None,
+        'written': not dry_run
+    }
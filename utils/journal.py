@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+from config import Config
+from utils.process_lock import try_lock
+
+logger = logging.getLogger(__name__)
+
+# Record ops: wishlist add/remove, reminder created/delivered
+OPS = ("add", "remove", "reminder", "done")
+
+def encode_record(record: Dict) -> bytes:
+    """One journal line: CRC32 of the JSON payload, a space, the payload"""
+    payload = json.dumps(record, separators=(',', ':')).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+def decode_line(line: bytes) -> Optional[Dict]:
+    """Parse one line; None if it is torn or fails its checksum"""
+    if not line.endswith(b"\n") or len(line) < 10 or line[8:9] != b" ":
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        record = json.loads(payload)
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or record.get("op") not in OPS or "user" not in record:
+        return None
+    return record
+
+def read_journal(path: str) -> Tuple[List[Dict], int, int]:
+    """Return (records, valid_bytes, total_bytes); reading stops at the first bad record"""
+    records = []
+    valid = 0
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                record = decode_line(line)
+                if record is None:
+                    break
+                records.append(record)
+                valid += len(line)
+            total = f.seek(0, os.SEEK_END)
+    except FileNotFoundError:
+        return [], 0, 0
+    return records, valid, total
+
+def apply_drop_records(user_drops: List[str], records: List[Dict]) -> List[str]:
+    """Replay wishlist records over a wishlist; idempotent, so replaying twice is harmless"""
+    drops = dict.fromkeys(user_drops)
+    for record in records:
+        op = record["op"]
+        if op == "add":
+            drops[record["airdrop_id"]] = None
+        elif op == "remove":
+            drops.pop(record["airdrop_id"], None)
+    return list(drops)
+
+def apply_reminder_records(reminders: List[Dict], records: List[Dict]) -> List[Dict]:
+    """Replay reminder records over a reminder list; idempotent"""
+    by_id = {reminder.get("id"): reminder for reminder in reminders}
+    for record in records:
+        op = record["op"]
+        if op == "reminder":
+            reminder = record["reminder"]
+            by_id.setdefault(reminder["id"], reminder)
+        elif op == "done" and record["reminder_id"] in by_id:
+            by_id[record["reminder_id"]] = dict(by_id[record["reminder_id"]], status="sent")
+    return list(by_id.values())
+
+def group_by_user(records: List[Dict]) -> Dict[str, List[Dict]]:
+    by_user = {}
+    for record in records:
+        by_user.setdefault(record["user"], []).append(record)
+    return by_user
+
+class UserJournal:
+    """Append-only, checksummed log of wishlist and reminder changes
+
+    A change costs one small sequential append. Concurrent appends share one
+    fsync: the first writer to need durability flushes everything written so
+    far while the others wait on it. Records not yet compacted are kept in
+    memory per user so reads can overlay them on the user files.
+
+    Compaction rotates the log, hands the rotated records to apply (which
+    rewrites each touched user's files once) and then deletes it. The user
+    files are the snapshot, so recovery replays whatever log files survived a
+    crash; replaying records that already reached the files is a no-op.
+
+    Only one process may own a journal path: open() takes an exclusive lock on
+    path.lock and returns False if another process (such as a sibling gunicorn
+    worker) already holds it.
+    """
+
+    def __init__(self, path: str, apply: Callable[[Dict[str, List[Dict]]], None],
+                 compact_bytes: int = None, compact_interval: float = None):
+        self.path = path
+        self.compacting_path = f"{path}.compacting"
+        self.lock_path = f"{path}.lock"
+        self._lock_file = None
+        self.apply = apply
+        self.compact_bytes = compact_bytes or Config.JOURNAL_COMPACT_BYTES
+        self.compact_interval = Config.JOURNAL_COMPACT_INTERVAL if compact_interval is None else compact_interval
+        self._file = None
+        self._lock = threading.Lock()
+        self._commit = threading.Condition(self._lock)
+        self._compact_lock = threading.Lock()
+        self._written = 0
+        self._durable = 0
+        self._syncing = False
+        self._size = 0
+        # user -> records appended since the last rotation, and those being compacted
+        self._live: Dict[str, List[Dict]] = {}
+        self._compacting: Dict[str, List[Dict]] = {}
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self.appends = 0
+        self.syncs = 0
+        self.compactions = 0
+        self.recovered = 0
+
+    def open(self) -> bool:
+        """Take the journal, recover from any log left behind and start a fresh one
+
+        Returns False, leaving everything untouched, if another process owns it.
+        """
+        lock_file = try_lock(self.lock_path)
+        if lock_file is None:
+            return False
+        self._lock_file = lock_file
+        for path in (self.compacting_path, self.path):
+            records, valid, total = read_journal(path)
+            if total > valid:
+                logger.warning(f"Discarding {total - valid} bytes of torn or corrupt journal at the end of {path}")
+            if records:
+                self.apply(group_by_user(records))
+                self.recovered += len(records)
+            if os.path.exists(path):
+                os.remove(path)
+        if self.recovered:
+            logger.info(f"Replayed {self.recovered} journal records into user files")
+        self._file = open(self.path, 'ab')
+        self._size = 0
+        return True
+
+    def append(self, record: Dict):
+        """Write a record and return once it is durable"""
+        line = encode_record(record)
+        with self._lock:
+            self._file.write(line)
+            self._size += len(line)
+            self._written += 1
+            ticket = self._written
+            self._live.setdefault(record["user"], []).append(record)
+            self.appends += 1
+            self._wait_durable(ticket)
+        if self._size >= self.compact_bytes:
+            self._wake.set()
+
+    def _wait_durable(self, ticket: int):
+        # Called with _lock held. One writer leads each sync; later writers
+        # either ride along on it or lead the next one.
+        while self._durable < ticket:
+            if self._syncing:
+                self._commit.wait()
+                continue
+            self._syncing = True
+            self._lock.release()
+            try:
+                if Config.FSYNC_WRITES and Config.JOURNAL_GROUP_COMMIT_DELAY:
+                    # Give concurrent writers a moment to join this sync
+                    time.sleep(Config.JOURNAL_GROUP_COMMIT_DELAY)
+            finally:
+                self._lock.acquire()
+            target = self._written
+            f = self._file
+            try:
+                f.flush()
+                if Config.FSYNC_WRITES:
+                    self._lock.release()
+                    try:
+                        os.fsync(f.fileno())
+                    finally:
+                        self._lock.acquire()
+                self._durable = max(self._durable, target)
+                self.syncs += 1
+            finally:
+                self._syncing = False
+                self._commit.notify_all()
+
+    def records_for(self, user: str) -> List[Dict]:
+        """Records for user that may not have reached the user files yet, oldest first"""
+        with self._lock:
+            return self._compacting.get(user, []) + self._live.get(user, [])
+
+    def users(self) -> List[str]:
+        with self._lock:
+            return list(set(self._compacting) | set(self._live))
+
+    def compact(self) -> int:
+        """Fold the current log into the user files; returns how many records were folded"""
+        with self._compact_lock:
+            folded = 0
+            if self._compacting:
+                # A previous compaction failed; finish it before rotating over its file
+                folded += self._fold()
+            with self._lock:
+                # Let an in-flight sync finish against the file being rotated
+                while self._syncing:
+                    self._commit.wait()
+                if not self._live:
+                    return folded
+                self._file.flush()
+                if Config.FSYNC_WRITES:
+                    os.fsync(self._file.fileno())
+                self._durable = self._written
+                self._file.close()
+                os.replace(self.path, self.compacting_path)
+                self._file = open(self.path, 'ab')
+                self._size = 0
+                self._compacting = self._live
+                self._live = {}
+            return folded + self._fold()
+
+    def _fold(self) -> int:
+        batch = self._compacting
+        self.apply(batch)
+        os.remove(self.compacting_path)
+        with self._lock:
+            self._compacting = {}
+        self.compactions += 1
+        return sum(len(records) for records in batch.values())
+
+    def start(self):
+        """Compact in the background every compact_interval seconds or once the log reaches compact_bytes"""
+        self._thread = threading.Thread(target=self._run, name="journal-compactor", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("Journal compaction failed; records stay in the log")
+
+    def close(self):
+        """Stop the compactor, fold what is left and close the log"""
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self.compact()
+            self._file.close()
+            self._file = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'appends': self.appends,
+            'syncs': self.syncs,
+            'compactions': self.compactions,
+            'recovered': self.recovered,
+            'bytes': self._size
+        }
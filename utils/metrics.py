@@ -0,0 +1,216 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Tuple
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _label_key(values) -> tuple:
+    return values if isinstance(values, tuple) else (values,)
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    """Prometheus histogram; observe() is a bisect and two additions, no locking"""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, label_values, seconds: float):
+        """Record one observation; label_values is a tuple, or a plain value for one label"""
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, (counts, total) in list(self._series.items()):
+            values = _label_key(label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, values)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}"
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, label_values=(), amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, _label_key(label_values))} {value}"
+
+class Gauge:
+    """Gauge whose samples are read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, labels: tuple, collect: Callable[[], Dict[tuple, float]],
+                 kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.collect = collect
+        self.kind = kind
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for label_values, value in self.collect().items():
+            yield f"{self.name}{_format_labels(self.labels, _label_key(label_values))} {value}"
+
+class MetricsRegistry:
+    """Holds every metric and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._caches = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def counter(self, name: str, documentation: str, labels: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, collect: Callable[[], Dict[tuple, float]],
+              labels: tuple = (), kind: str = "gauge") -> Gauge:
+        return self._register(Gauge(name, documentation, labels, collect, kind))
+
+    def watch_cache(self, name: str, cache):
+        """Export hit/miss/eviction counters of anything with an LRUCache-style stats()"""
+        if not self._caches:
+            for stat, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                               ('size', 'gauge'), ('hit_ratio', 'gauge')):
+                suffix = '_total' if kind == 'counter' else ''
+                self.gauge(f"airdrop_bot_cache_{stat}{suffix}", f"Cache {stat.replace('_', ' ')}",
+                           functools.partial(self._collect_cache_stat, stat), ('cache',), kind)
+        self._caches[name] = cache
+
+    def _collect_cache_stat(self, stat: str) -> Dict[str, float]:
+        return {name: cache.stats()[stat] for name, cache in self._caches.items()}
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Global registry and the metrics shared across modules
+registry = MetricsRegistry()
+HANDLER_SECONDS = registry.histogram(
+    "airdrop_bot_handler_seconds", "Time to handle one update, by command or callback route", ("handler",))
+HANDLER_ERRORS = registry.counter(
+    "airdrop_bot_handler_errors_total", "Updates whose handler raised", ("handler",))
+STORAGE_SECONDS = registry.histogram(
+    "airdrop_bot_storage_seconds", "Storage call latency, including thread pool queueing", ("operation",))
+TELEGRAM_SECONDS = registry.histogram(
+    "airdrop_bot_telegram_api_seconds", "Bot API request latency", ("method",))
+TELEGRAM_ERRORS = registry.counter(
+    "airdrop_bot_telegram_api_errors_total", "Bot API requests that failed or returned an error status",
+    ("method", "error"))
+LOOP_LAG_SECONDS = registry.histogram(
+    "airdrop_bot_event_loop_lag_seconds", "How late the event loop ran a timer it was asked to run")
+
+def timed(label: str, func: Callable) -> Callable:
+    """Wrap an async handler so its latency and failures are recorded under label"""
+    if not Config.METRICS_ENABLED:
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS.inc(label)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(label, time.perf_counter() - start)
+
+    return wrapper
+
+async def monitor_loop_lag(interval: float = None):
+    """Sleep for interval repeatedly and record how much later than asked the loop woke us"""
+    interval = interval or Config.METRICS_LOOP_LAG_INTERVAL
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe((), max(0.0, time.perf_counter() - start - interval))
+
+def create_instrumented_request(**kwargs):
+    """Return an HTTPXRequest that records latency and errors for every Bot API call"""
+    from telegram.request import HTTPXRequest
+
+    class InstrumentedRequest(HTTPXRequest):
+        async def do_request(self, url: str, method: str, *args, **kwargs) -> Tuple[int, bytes]:
+            api_method = url.rsplit("/", 1)[-1]
+            start = time.perf_counter()
+            try:
+                code, payload = await super().do_request(url, method, *args, **kwargs)
+            except Exception as e:
+                TELEGRAM_ERRORS.inc((api_method, type(e).__name__))
+                raise
+            finally:
+                TELEGRAM_SECONDS.observe(api_method, time.perf_counter() - start)
+            if code >= 400:
+                TELEGRAM_ERRORS.inc((api_method, str(code)))
+            return code, payload
+
+    kwargs.setdefault("connection_pool_size", 256)
+    return InstrumentedRequest(**kwargs)
+
+def start_metrics_server(host: str = None, port: int = None):
+    """Serve /metrics from a daemon thread, for modes without the Flask app"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host or Config.FLASK_HOST, port or Config.METRICS_PORT), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving metrics on port {server.server_address[1]}")
+    return server
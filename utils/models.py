@@ -0,0 +1,202 @@
+import json
+import sys
+from typing import Dict, Iterator
+
+class Links:
+    """Compact container for an airdrop's external links"""
+
+    __slots__ = ('website', 'twitter', 'discord', 'extra')
+
+    KNOWN = ('website', 'twitter', 'discord')
+
+    def __init__(self, links: Dict):
+        self.website = links.get('website')
+        self.twitter = links.get('twitter')
+        self.discord = links.get('discord')
+        extra = tuple((sys.intern(k), v) for k, v in links.items() if k not in self.KNOWN)
+        self.extra = extra or None
+
+    def get(self, key: str, default=None):
+        if key in self.KNOWN:
+            value = getattr(self, key)
+            return default if value is None else value
+        for k, v in self.extra or ():
+            if k == key:
+                return v
+        return default
+
+    def __getitem__(self, key: str):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __bool__(self) -> bool:
+        return bool(self.website or self.twitter or self.discord or self.extra)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Links) and self.to_dict() == other.to_dict()
+
+    def to_dict(self) -> Dict:
+        links = {key: getattr(self, key) for key in self.KNOWN if getattr(self, key) is not None}
+        links.update(self.extra or ())
+        return links
+
+class Airdrop:
+    """Slotted airdrop record that reads like the JSON dict it came from"""
+
+    __slots__ = (
+        'id', 'title', 'description', 'category', 'status', 'end_date',
+        'reward', 'difficulty', 'links', 'tasks', 'banner', 'extra'
+    )
+
+    FIELDS = __slots__[:-1]
+    # Low-cardinality fields shared between records instead of duplicated
+    INTERNED = ('category', 'status', 'difficulty', 'end_date')
+
+    def __init__(self, data: Dict):
+        for field in self.FIELDS:
+            setattr(self, field, data.get(field))
+        for field in self.INTERNED:
+            value = getattr(self, field)
+            if isinstance(value, str):
+                setattr(self, field, sys.intern(value))
+        self.links = Links(self.links) if self.links else None
+        self.tasks = tuple(self.tasks) if self.tasks else None
+        extra = {k: v for k, v in data.items() if k not in self.FIELDS}
+        self.extra = extra or None
+
+    def __getitem__(self, key: str):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: str, default=None):
+        """dict.get equivalent; absent fields return default"""
+        if key in self.FIELDS:
+            value = getattr(self, key)
+        elif self.extra:
+            value = self.extra.get(key)
+        else:
+            value = None
+        return default if value is None else value
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Airdrop):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"Airdrop({self.id!r}, {self.title!r})"
+
+    def to_dict(self) -> Dict:
+        """Convert back to the alldrops.json representation"""
+        data = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is None:
+                continue
+            if field == 'links':
+                value = value.to_dict()
+            elif field == 'tasks':
+                value = list(value)
+            data[field] = value
+        data.update(self.extra or {})
+        return data
+
+def iter_airdrops(path: str, chunk_size: int = 64 * 1024) -> Iterator[Dict]:
+    """Yield airdrop dicts one at a time from {"airdrops": [...]} without parsing the whole file"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ''
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        # Seek to the opening bracket of the "airdrops" array
+        while True:
+            key = buf.find('"airdrops"', pos)
+            if key != -1:
+                bracket = buf.find('[', key)
+                if bracket != -1:
+                    pos = bracket + 1
+                    break
+            if not fill():
+                raise ValueError('No "airdrops" array found')
+
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buf):
+                if not fill():
+                    raise ValueError('Unterminated "airdrops" array')
+                continue
+            if buf[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof or not fill():
+                    raise
+                continue
+            pos = end
+            yield item
+
+def load_compact_airdrops(path: str) -> list:
+    """Stream alldrops.json straight into compact Airdrop records"""
+    return [Airdrop(item) for item in iter_airdrops(path)]
+
+def measure_memory_per_airdrop(count: int = 10000, compact: bool = True) -> float:
+    """Return traced bytes per airdrop for a synthetic catalog of the given size"""
+    import tracemalloc
+    categories = ['DeFi', 'Layer 2', 'NFT', 'Gaming']
+    statuses = ['active', 'hot', 'ending_soon', 'expired']
+    raw = [
+        {
+            'id': f'airdrop_{i:06d}',
+            'title': f'Project {i} Airdrop',
+            'description': f'Complete tasks to earn tokens for project {i}. Connect wallet and perform swaps.',
+            'category': categories[i % 4],
+            'status': statuses[i % 4],
+            'end_date': f'2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+            'reward': f'Up to {i % 1000} TOKEN',
+            'difficulty': 'Medium',
+            'links': {'website': f'https://project{i}.io', 'twitter': f'https://twitter.com/project{i}'},
+            'tasks': ['Connect wallet', 'Perform 3 swaps', 'Hold tokens for 30 days'],
+            'banner': f'project{i}_banner.jpg'
+        }
+        for i in range(count)
+    ]
+    # Round-trip through JSON text so strings are not shared with the generator
+    text = json.dumps(raw)
+    del raw
+
+    tracemalloc.start()
+    try:
+        if compact:
+            records = [Airdrop(item) for item in json.loads(text)]
+        else:
+            records = json.loads(text)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del records
+    return size / count
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f"dict:    {measure_memory_per_airdrop(n, compact=False):.0f} bytes/airdrop")
+    print(f"compact: {measure_memory_per_airdrop(n, compact=True):.0f} bytes/airdrop")
@@ -0,0 +1,25 @@
+import os
+from typing import IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only
+    fcntl = None
+
+def try_lock(path: str) -> Optional[IO]:
+    """Take an exclusive lock on path without waiting; None if another process holds it
+
+    The lock lasts until the returned file is closed or the process exits.
+    The lock file is never deleted, so its inode is never swapped under a waiter.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    lock_file = open(path, 'a')
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+    return lock_file
@@ -0,0 +1,207 @@
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def collapse_stack(frame) -> str:
+    """Render a frame chain root-first in the collapsed format flame graph tools read"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+def write_collapsed(path: str, stacks: Counter):
+    """Write one 'stack count' line per distinct stack"""
+    with open(path, "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+class Capture:
+    """Stack samples of one thread, collected while the capture is open"""
+
+    __slots__ = ("thread_id", "stacks", "started", "deadline")
+
+    def __init__(self, thread_id: int, deadline: float = None):
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.started = time.monotonic()
+        self.deadline = deadline
+
+class UpdateProfiler:
+    """Sampling profiler for update handlers, built on sys._current_frames()
+
+    A background thread samples the event loop thread's stack only while a
+    capture is open, so unsampled updates cost one random() call. Samples show
+    everything the loop did while the update was in flight, including other
+    updates interleaved with it.
+    """
+
+    def __init__(self, directory: str = None, sample_rate: float = None, slow_threshold: float = None,
+                 interval: float = None):
+        self.directory = directory or Config.PROFILES_DIR
+        self.sample_rate = Config.PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_threshold = Config.PROFILE_SLOW_THRESHOLD if slow_threshold is None else slow_threshold
+        self.interval = interval or Config.PROFILE_INTERVAL
+        self._captures = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.full_capture = None
+        self.slow_dumps = 0
+        # Slow-update dumps are written here so the event loop never waits on the disk
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profiler-dump")
+
+    def begin(self) -> Optional[Capture]:
+        """Open a capture for the calling thread if this update is sampled"""
+        if self.full_capture is not None or not self.sample_rate or random.random() >= self.sample_rate:
+            return None
+        capture = Capture(threading.get_ident())
+        self._open(capture)
+        return capture
+
+    def is_slow(self, elapsed: float) -> bool:
+        """True if an update this long gets dumped; a threshold of 0 turns dumps off"""
+        return bool(self.slow_threshold) and elapsed >= self.slow_threshold
+
+    def finish(self, capture: Optional[Capture], label: str, elapsed: float):
+        """Close a capture and, if the update was slow, queue a dump of it
+
+        Dumps hold the handler label, timings and stacks, never the update's content.
+        """
+        if capture is not None:
+            with self._lock:
+                self._captures.discard(capture)
+        if not self.is_slow(elapsed):
+            return
+        self.slow_dumps += 1
+        self._writer.submit(
+            self._dump_slow,
+            f"slow-{int(time.time() * 1000)}-{label.replace(':', '_')}",
+            Counter(capture.stacks) if capture is not None else None,
+            {
+                "label": label,
+                "elapsed": round(elapsed, 6),
+                "sampled": capture is not None or self.full_capture is not None,
+                "time": time.time()
+            }
+        )
+
+    def _dump_slow(self, name: str, stacks: Optional[Counter], meta: dict):
+        try:
+            self._dump(name, stacks, meta)
+        except OSError as e:
+            logger.warning(f"Could not write slow update profile: {e}")
+
+    def start_full(self, seconds: float) -> bool:
+        """Sample the calling thread continuously for seconds; False if already running"""
+        if self.full_capture is not None:
+            return False
+        seconds = min(seconds, Config.PROFILE_MAX_SECONDS)
+        self.full_capture = Capture(threading.get_ident(), time.monotonic() + seconds)
+        self._open(self.full_capture)
+        logger.info(f"Full profiling for {seconds}s")
+        return True
+
+    def _open(self, capture: Capture):
+        with self._lock:
+            self._captures.add(capture)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+                self._thread.start()
+
+    def _sample(self):
+        while True:
+            with self._lock:
+                if not self._captures:
+                    self._thread = None
+                    return
+                captures = list(self._captures)
+
+            frames = sys._current_frames()
+            stacks = {}
+            for capture in captures:
+                stack = stacks.get(capture.thread_id)
+                if stack is None:
+                    frame = frames.get(capture.thread_id)
+                    stack = stacks[capture.thread_id] = collapse_stack(frame) if frame else ""
+                if stack:
+                    capture.stacks[stack] += 1
+            del frames
+
+            full = self.full_capture
+            if full is not None and time.monotonic() >= full.deadline:
+                self._finish_full(full)
+            time.sleep(self.interval)
+
+    def _finish_full(self, capture: Capture):
+        with self._lock:
+            self._captures.discard(capture)
+        self.full_capture = None
+        try:
+            path = self._dump(f"full-{int(time.time())}", capture.stacks, {
+                "elapsed": round(time.monotonic() - capture.started, 3),
+                "samples": sum(capture.stacks.values()),
+                "interval": self.interval
+            })
+            logger.info(f"Full profile written to {path}")
+        except OSError as e:
+            logger.warning(f"Could not write full profile: {e}")
+
+    def _dump(self, name: str, stacks: Optional[Counter], meta: dict) -> str:
+        """Write name.json with meta and, if there are samples, name.folded"""
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, name)
+        if stacks:
+            write_collapsed(base + ".folded", stacks)
+        with open(base + ".json", "w") as f:
+            json.dump(meta, f, default=str)
+        self._prune()
+        return base + (".folded" if stacks else ".json")
+
+    def _prune(self):
+        """Delete the oldest dumps beyond Config.PROFILE_MAX_FILES"""
+        dumps = {}
+        for entry in os.scandir(self.directory):
+            name, extension = os.path.splitext(entry.name)
+            if extension in (".json", ".folded"):
+                dumps.setdefault(name, []).append(entry)
+        if len(dumps) <= Config.PROFILE_MAX_FILES:
+            return
+        oldest = sorted(dumps.values(), key=lambda entries: min(e.stat().st_mtime for e in entries))
+        for entries in oldest[:len(dumps) - Config.PROFILE_MAX_FILES]:
+            for entry in entries:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+def profiled(label: str, func: Callable, update_profiler: "UpdateProfiler" = None) -> Callable:
+    """Wrap an async (update, context) handler with sampling and slow-update capture"""
+    update_profiler = update_profiler or profiler
+
+    @functools.wraps(func)
+    async def wrapper(update, *args, **kwargs):
+        capture = update_profiler.begin()
+        start = time.perf_counter()
+        try:
+            return await func(update, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            if capture is not None or update_profiler.is_slow(elapsed):
+                update_profiler.finish(capture, label, elapsed)
+
+    return wrapper
+
+# Global profiler
+profiler = UpdateProfiler()
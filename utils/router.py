@@ -0,0 +1,267 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from config import Config
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects callback_data longer than this many bytes
+MAX_CALLBACK_BYTES = 64
+
+ENCODED_MARKER = "!"
+TOKEN_MARKER = "~"
+
+def _encode_varint(value: int, out: bytearray):
+    if value < 0:
+        raise ValueError("Callback integers must be non-negative")
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+def _decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+class Route:
+    __slots__ = ('opcode', 'name', 'handler', 'arg_types', 'legacy')
+
+    def __init__(self, opcode: int, name: str, handler: Callable, arg_types: tuple, legacy: Optional[str]):
+        self.opcode = opcode
+        self.name = name
+        self.handler = handler
+        self.arg_types = arg_types
+        self.legacy = legacy
+
+class TokenStore:
+    """Server-side store for callback state too large to inline
+
+    Tokens are a hash of the payload, so every process and restart derives the
+    same token for the same button. Payloads are kept in an SQLite file shared
+    by all workers, with an in-memory LRU in front of it. Writes go to SQLite
+    on a background thread and event-loop lookups use get_async(), so the
+    loop never waits on the database.
+    """
+
+    def __init__(self, maxsize: int = None, ttl: float = None, db_path: str = None):
+        self.ttl = Config.CALLBACK_TOKEN_TTL if ttl is None else ttl
+        self.db_path = db_path or Config.CALLBACK_TOKEN_DB
+        self._entries = LRUCache(maxsize or Config.CALLBACK_TOKEN_STORE_SIZE)
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="callback-tokens")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened on first use so importing the bot touches nothing on disk
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("CREATE TABLE IF NOT EXISTS callback_tokens "
+                         "(token TEXT PRIMARY KEY, payload BLOB NOT NULL, expires_at REAL NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def token_for(payload: bytes) -> str:
+        return base64.urlsafe_b64encode(hashlib.blake2b(payload, digest_size=12).digest()).decode('ascii')
+
+    def put(self, payload: bytes) -> str:
+        """Store a payload and return its short token"""
+        token = self.token_for(payload)
+        entry = self._entries.get(token)
+        # Persist new tokens, and refresh the expiry once half the TTL has passed
+        if entry is None or entry[0] - time.time() < self.ttl / 2:
+            expires_at = time.time() + self.ttl
+            self._entries.put(token, (expires_at, payload))
+            self._writer.submit(self._persist, token, payload, expires_at)
+        return token
+
+    def _persist(self, token: str, payload: bytes, expires_at: float):
+        try:
+            with self._db_lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO callback_tokens VALUES (?, ?, ?)",
+                                 (token, payload, expires_at))
+                    conn.execute("DELETE FROM callback_tokens WHERE expires_at < ?", (time.time(),))
+        except sqlite3.Error as e:
+            # Still served from memory by this process
+            logger.warning(f"Could not persist callback token: {e}")
+
+    def get(self, token: str) -> Optional[bytes]:
+        """Return the payload for a token, or None if unknown or expired (may query SQLite)"""
+        entry = self._entries.get(token)
+        if entry is None:
+            with self._db_lock:
+                entry = self._connect().execute(
+                    "SELECT expires_at, payload FROM callback_tokens WHERE token = ?", (token,)
+                ).fetchone()
+            if entry is None:
+                return None
+            self._entries.put(token, entry)
+        expires_at, payload = entry
+        if expires_at < time.time():
+            self._entries.pop(token)
+            return None
+        return payload
+
+    async def get_async(self, token: str) -> Optional[bytes]:
+        """get() that queries SQLite on the default executor when the token is not cached"""
+        if token in self._entries:
+            return self.get(token)
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, token)
+
+    def stats(self) -> Dict[str, float]:
+        """Return the underlying cache's counters"""
+        return self._entries.stats()
+
+class CallbackRouter:
+    """Maps one-byte opcodes to handlers and packs typed arguments into callback_data"""
+
+    def __init__(self, token_store: TokenStore = None):
+        self.token_store = token_store or TokenStore()
+        self._by_opcode: Dict[int, Route] = {}
+        self._by_name: Dict[str, Route] = {}
+        self._legacy: Dict[str, Route] = {}
+        self._legacy_parsers = []
+
+    def add(self, opcode: str, name: str, handler: Callable, *arg_types, legacy: str = None):
+        """Register a route
+
+        opcode is a single stable character; it is what old buttons carry, so
+        never reuse one for a different route. arg_types are int or str.
+        legacy is the pre-router callback_data prefix still found on old messages.
+        """
+        code = ord(opcode)
+        if code > 0xFF or code in self._by_opcode:
+            raise ValueError(f"Invalid or duplicate opcode {opcode!r}")
+        for arg_type in arg_types:
+            if arg_type not in (int, str):
+                raise TypeError(f"Unsupported callback argument type {arg_type}")
+        route = Route(code, name, handler, arg_types, legacy)
+        self._by_opcode[code] = route
+        self._by_name[name] = route
+        if legacy:
+            self._legacy[legacy] = route
+
+    def add_legacy(self, prefix: str, name: str, parse: Callable[[str], Optional[tuple]] = None):
+        """Accept another pre-router callback_data prefix for an existing route
+
+        parse turns the text after the prefix into the route's arguments, or
+        None if it does not fit; by default the route's argument types decide.
+        """
+        self._legacy_parsers.append((prefix, self._by_name[name], parse))
+        self._legacy_parsers.sort(key=lambda item: -len(item[0]))
+
+    def encode(self, name: str, *args) -> str:
+        """Build callback_data for a route, spilling to the token store when too long"""
+        route = self._by_name[name]
+        if len(args) != len(route.arg_types):
+            raise TypeError(f"{name} takes {len(route.arg_types)} arguments, got {len(args)}")
+
+        packed = bytearray((route.opcode,))
+        for arg_type, value in zip(route.arg_types, args):
+            if arg_type is int:
+                _encode_varint(int(value), packed)
+            else:
+                raw = str(value).encode('utf-8')
+                _encode_varint(len(raw), packed)
+                packed += raw
+
+        data = ENCODED_MARKER + base64.urlsafe_b64encode(bytes(packed)).rstrip(b'=').decode('ascii')
+        if len(data) > MAX_CALLBACK_BYTES:
+            data = TOKEN_MARKER + self.token_store.put(bytes(packed))
+        return data
+
+    def _unpack(self, packed: bytes) -> Optional[Tuple[Route, tuple]]:
+        route = self._by_opcode.get(packed[0])
+        if route is None:
+            return None
+        args = []
+        pos = 1
+        for arg_type in route.arg_types:
+            value, pos = _decode_varint(packed, pos)
+            if arg_type is str:
+                value, pos = packed[pos:pos + value].decode('utf-8'), pos + value
+            args.append(value)
+        if pos != len(packed):
+            return None
+        return route, tuple(args)
+
+    def _decode_legacy(self, data: str) -> Optional[Tuple[Route, tuple]]:
+        for prefix, route, parse in self._legacy_parsers:
+            if not data.startswith(prefix):
+                continue
+            rest = data[len(prefix):]
+            if parse is not None:
+                args = parse(rest)
+            elif route.arg_types == (int,):
+                args = (int(rest),) if rest.isdigit() else None
+            elif route.arg_types == (str,):
+                args = (rest,)
+            else:
+                args = () if not rest and not route.arg_types else None
+            if args is not None:
+                return route, args
+        route = self._legacy.get(data)
+        if route is not None and not route.arg_types:
+            return route, ()
+        prefix, _, rest = data.rpartition("_")
+        route = self._legacy.get(prefix + "_")
+        if route is not None and route.arg_types == (int,) and rest.isdigit():
+            return route, (int(rest),)
+        for legacy, route in sorted(self._legacy.items(), key=lambda item: -len(item[0])):
+            if data.startswith(legacy) and route.arg_types == (str,):
+                return route, (data[len(legacy):],)
+        return None
+
+    def decode(self, data: str) -> Optional[Tuple[Route, tuple]]:
+        """Resolve callback_data to (route, args); None if unknown or expired"""
+        try:
+            if data.startswith(ENCODED_MARKER):
+                encoded = data[1:]
+                packed = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+                resolved = self._unpack(packed)
+            elif data.startswith(TOKEN_MARKER):
+                packed = self.token_store.get(data[1:])
+                resolved = self._unpack(packed) if packed else None
+            else:
+                resolved = self._decode_legacy(data)
+        except (ValueError, IndexError, UnicodeDecodeError):
+            return None
+
+        return resolved
+
+    async def decode_async(self, data: str) -> Optional[Tuple[Route, tuple]]:
+        """decode() for the event loop: tokens missing from memory are looked up off the loop"""
+        if not data.startswith(TOKEN_MARKER):
+            return self.decode(data)
+        try:
+            packed = await self.token_store.get_async(data[1:])
+            return self._unpack(packed) if packed else None
+        except (ValueError, IndexError, UnicodeDecodeError):
+            return None
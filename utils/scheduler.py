@@ -0,0 +1,148 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from telegram.error import BadRequest, Forbidden, RetryAfter
+from config import Config
+from utils.broadcast import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+def compute_due_at(option_text: str, now: float = None) -> Optional[float]:
+    """Convert a Config.REMINDER_OPTIONS label into an absolute UNIX timestamp"""
+    minutes = Config.REMINDER_OPTIONS.get(option_text)
+    if minutes is None:
+        return None
+    if now is None:
+        now = time.time()
+    return now + minutes * 60
+
+class ReminderScheduler:
+    """Min-heap of pending reminders that sleeps until the next one is due
+
+    Deliveries draw from a token bucket so a backlog after a restart stays
+    within Telegram's flood limits. Reminders that can never be delivered
+    (the user blocked the bot, the chat is gone) or that keep failing are
+    handed to discard so they are not loaded again on the next start.
+    """
+
+    def __init__(self, deliver: Callable[[str, Dict], Awaitable[None]],
+                 discard: Callable[[str, Dict], Awaitable[None]] = None, bucket: TokenBucket = None):
+        self.deliver = deliver
+        self.discard = discard
+        self.bucket = bucket or TokenBucket(Config.BROADCAST_RATE, Config.BROADCAST_BURST)
+        self._heap = []
+        self._counter = itertools.count()
+        # reminder id -> failed delivery attempts so far
+        self._attempts = {}
+        self._wakeup = None
+        self._task = None
+        self.delivered_count = 0
+        self.failed_count = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, username: str, reminder: Dict):
+        """Queue a reminder; O(log n)"""
+        due_at = reminder["due_at"]
+        wake = not self._heap or due_at < self._heap[0][0]
+        heapq.heappush(self._heap, (due_at, next(self._counter), username, reminder))
+        if wake and self._wakeup is not None:
+            self._wakeup.set()
+
+    def load(self, pending: List[Dict]):
+        """Bulk-load reminders read from storage in O(n)"""
+        for reminder in pending:
+            self._heap.append((reminder["due_at"], next(self._counter), reminder["username"], reminder))
+        heapq.heapify(self._heap)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def next_due(self) -> Optional[float]:
+        """Timestamp of the earliest pending reminder"""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float = None) -> List[tuple]:
+        """Remove and return every (username, reminder) due at or before now"""
+        if now is None:
+            now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, username, reminder = heapq.heappop(self._heap)
+            due.append((username, reminder))
+        return due
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            next_due = self.next_due()
+            timeout = None if next_due is None else max(0.0, next_due - time.time())
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for username, reminder in self.pop_due():
+                await self.bucket.acquire()
+                try:
+                    await self.deliver(username, reminder)
+                    self.delivered_count += 1
+                    self._attempts.pop(reminder["id"], None)
+                except RetryAfter as e:
+                    retry_after = e.retry_after
+                    if not isinstance(retry_after, (int, float)):
+                        retry_after = retry_after.total_seconds()
+                    # Flood wait: not the reminder's fault, so it costs no attempt
+                    self.bucket.pause(retry_after)
+                    heapq.heappush(self._heap, (time.time() + retry_after, next(self._counter), username, reminder))
+                except (Forbidden, BadRequest) as e:
+                    self.failed_count += 1
+                    await self.give_up(username, reminder, e)
+                except Exception as e:
+                    self.failed_count += 1
+                    await self.retry(username, reminder, e)
+    
+    async def retry(self, username: str, reminder: Dict, error: Exception):
+        """Re-queue a failed delivery with exponential backoff, giving up after REMINDER_MAX_RETRIES"""
+        attempts = self._attempts.get(reminder["id"], 0) + 1
+        if attempts > Config.REMINDER_MAX_RETRIES:
+            self._attempts.pop(reminder["id"], None)
+            await self.give_up(username, reminder, error)
+            return
+        self._attempts[reminder["id"]] = attempts
+        delay = Config.REMINDER_RETRY_DELAY * 2 ** (attempts - 1)
+        logger.warning(f"Error delivering reminder {reminder['id']} to {username} "
+                       f"(attempt {attempts}), retrying in {delay:g}s: {error}")
+        heapq.heappush(self._heap, (time.time() + delay, next(self._counter), username, reminder))
+
+    async def give_up(self, username: str, reminder: Dict, error: Exception):
+        """Drop an undeliverable reminder for good"""
+        logger.error(f"Giving up on reminder {reminder['id']} for {username}: {error}")
+        if self.discard is None:
+            return
+        try:
+            await self.discard(username, reminder)
+        except Exception as e:
+            # Still pending on disk, so the next start tries it again
+            logger.error(f"Could not discard reminder {reminder['id']} for {username}: {e}")
+
+    def start(self):
+        """Start the scheduler loop on the running event loop"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the scheduler loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
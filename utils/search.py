@@ -0,0 +1,187 @@
+import bisect
+import heapq
+import re
+import threading
+from typing import Dict, List, Tuple
+from config import Config
+from utils.cache import LRUCache
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Relative weight of a token depending on the field it came from
+FIELD_WEIGHTS = (
+    ('title', 4.0),
+    ('category', 2.0),
+    ('tasks', 1.0),
+    ('description', 1.0)
+)
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+class SearchIndex:
+    """Inverted index over airdrop text fields with prefix completion"""
+
+    def __init__(self, cache_size: int = None):
+        self._postings = {}
+        self._doc_tokens = {}
+        self._vocabulary = []
+        self._order = {}
+        self._ranked = {}
+        self._lock = threading.Lock()
+        self.cache = LRUCache(cache_size or Config.SEARCH_CACHE_SIZE)
+
+    def __len__(self) -> int:
+        return len(self._doc_tokens)
+
+    @staticmethod
+    def _weigh(airdrop) -> Dict[str, float]:
+        weights = {}
+        for field, weight in FIELD_WEIGHTS:
+            value = airdrop.get(field)
+            if not value:
+                continue
+            text = value if isinstance(value, str) else " ".join(value)
+            for token in tokenize(text):
+                weights[token] = weights.get(token, 0.0) + weight
+        return weights
+
+    def _add(self, airdrop_id: str, airdrop):
+        weights = self._weigh(airdrop)
+        self._doc_tokens[airdrop_id] = weights
+        for token, weight in weights.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+            posting[airdrop_id] = weight
+            self._ranked.pop(token, None)
+
+    def _remove(self, airdrop_id: str):
+        for token in self._doc_tokens.pop(airdrop_id, ()):
+            posting = self._postings[token]
+            posting.pop(airdrop_id, None)
+            self._ranked.pop(token, None)
+            if not posting:
+                del self._postings[token]
+                i = bisect.bisect_left(self._vocabulary, token)
+                del self._vocabulary[i]
+
+    def update(self, old_by_id: Dict, new_by_id: Dict, change):
+        """Re-index only the airdrops a CatalogChange lists as added, changed or removed"""
+        with self._lock:
+            for airdrop_id in change.removed + change.changed:
+                self._remove(airdrop_id)
+            for airdrop_id in change.added + change.changed:
+                self._add(airdrop_id, new_by_id[airdrop_id])
+            self._order = {airdrop_id: i for i, airdrop_id in enumerate(new_by_id)}
+            self._ranked.clear()
+            self.cache.clear()
+
+    def complete(self, prefix: str, limit: int = None) -> List[str]:
+        """Indexed tokens starting with prefix, alphabetically"""
+        limit = limit or Config.SEARCH_MAX_PREFIX_EXPANSIONS
+        i = bisect.bisect_left(self._vocabulary, prefix)
+        tokens = []
+        while i < len(self._vocabulary) and len(tokens) < limit:
+            token = self._vocabulary[i]
+            if not token.startswith(prefix):
+                break
+            tokens.append(token)
+            i += 1
+        return tokens
+
+    def _term_postings(self, term: str, prefix: bool) -> List[Tuple[Dict[str, float], float]]:
+        """(posting, boost) pairs a term matches; prefixes expand to several tokens"""
+        if not prefix:
+            posting = self._postings.get(term)
+            return [(posting, 1.0)] if posting else []
+        # Exact matches outrank completions of the same prefix
+        return [(self._postings[token], 1.0 if token == term else 0.5) for token in self.complete(term)]
+
+    def _ranked_posting(self, token: str) -> List[Tuple[float, int, str]]:
+        """Posting sorted best first, built lazily and kept until the token changes"""
+        ranked = self._ranked.get(token)
+        if ranked is None:
+            order = self._order
+            ranked = sorted((-weight, order.get(airdrop_id, 0), airdrop_id)
+                            for airdrop_id, weight in self._postings[token].items())
+            self._ranked[token] = ranked
+        return ranked
+
+    def _search_single(self, term: str, limit: int) -> List[Tuple[str, float]]:
+        """Top results for a one-term query by merging pre-ranked postings"""
+        streams = []
+        for token in self.complete(term):
+            ranked = self._ranked_posting(token)
+            if token == term:
+                streams.append(ranked)
+            else:
+                streams.append((neg * 0.5, order, airdrop_id) for neg, order, airdrop_id in ranked)
+        results = []
+        seen = set()
+        for neg, _, airdrop_id in heapq.merge(*streams):
+            if airdrop_id in seen:
+                continue
+            seen.add(airdrop_id)
+            results.append((airdrop_id, -neg))
+            if len(results) >= limit:
+                break
+        return results
+
+    @staticmethod
+    def _score(airdrop_id: str, postings: List[Tuple[Dict[str, float], float]]) -> float:
+        best = 0.0
+        for posting, boost in postings:
+            weight = posting.get(airdrop_id)
+            if weight is not None and weight * boost > best:
+                best = weight * boost
+        return best
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Return (airdrop_id, score) pairs matching every query term, best first
+
+        The last term is treated as a prefix so partially typed words match.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        key = (" ".join(terms), limit)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            if len(terms) == 1:
+                ranked = self._search_single(terms[0], limit)
+                self.cache.put(key, ranked)
+                return ranked
+
+            term_postings = [
+                self._term_postings(term, prefix=(i == len(terms) - 1))
+                for i, term in enumerate(terms)
+            ]
+            # Drive the intersection from the most selective term
+            term_postings.sort(key=lambda postings: sum(len(p) for p, _ in postings))
+            candidates = {}
+            for posting, _ in term_postings[0]:
+                candidates.update(dict.fromkeys(posting))
+
+            results = []
+            for airdrop_id in candidates:
+                total = 0.0
+                for postings in term_postings:
+                    score = self._score(airdrop_id, postings)
+                    if not score:
+                        break
+                    total += score
+                else:
+                    results.append((airdrop_id, total))
+
+            order = self._order
+            ranked = heapq.nsmallest(limit, results, key=lambda item: (-item[1], order.get(item[0], 0)))
+
+        self.cache.put(key, ranked)
+        return ranked
@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+from config import Config
+
+# Rough per-object costs used to keep the cache under its byte budget
+SESSION_BASE_BYTES = 400
+DROP_BYTES = 120
+REMINDER_BYTES = 900
+
+class UserSession:
+    """One active user's wishlist (an ordered set) and reminders, each loaded on first use"""
+
+    __slots__ = ('drops', 'reminders', 'touched', 'weight')
+
+    def __init__(self):
+        # airdrop_id -> None, in the order the user added them
+        self.drops: Optional[Dict[str, None]] = None
+        self.reminders: Optional[List[Dict]] = None
+        self.touched = 0.0
+        self.weight = 0
+
+    def measure(self) -> int:
+        """Approximate bytes held by this session"""
+        return (SESSION_BASE_BYTES
+                + DROP_BYTES * len(self.drops or ())
+                + REMINDER_BYTES * len(self.reminders or ()))
+
+class SessionCache:
+    """LRU of UserSession bounded by entry count, idle time and approximate bytes
+
+    Sessions idle for longer than ttl are dropped on access or when they reach
+    the cold end of the LRU, so mostly idle users cost nothing once they leave.
+    Nothing invalidates a session when another process writes the user's data,
+    so DatabaseManager only fills the cache when Config.SESSION_CACHE is set.
+    """
+
+    def __init__(self, maxsize: int = None, ttl: float = None, max_bytes: int = None):
+        self.maxsize = maxsize or Config.SESSION_CACHE_SIZE
+        self.ttl = Config.SESSION_TTL if ttl is None else ttl
+        self.max_bytes = max_bytes or Config.SESSION_CACHE_MAX_BYTES
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def _expired(self, session: UserSession, now: float) -> bool:
+        return now - session.touched > self.ttl
+
+    def _remove(self, key: Hashable) -> Optional[UserSession]:
+        session = self._data.pop(key, None)
+        if session is not None:
+            self.bytes -= session.weight
+        return session
+
+    def _trim(self, now: float):
+        data = self._data
+        # The LRU end holds the longest idle sessions
+        while data:
+            key, session = next(iter(data.items()))
+            if not self._expired(session, now):
+                break
+            self._remove(key)
+            self.expirations += 1
+        while len(data) > 1 and (len(data) > self.maxsize or self.bytes > self.max_bytes):
+            _, session = data.popitem(last=False)
+            self.bytes -= session.weight
+            self.evictions += 1
+
+    def get(self, key: Hashable) -> Optional[UserSession]:
+        """Return a live session and mark it recently used"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._data.get(key)
+            if session is None:
+                self.misses += 1
+                return None
+            if self._expired(session, now):
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            session.touched = now
+            self._data.move_to_end(key)
+            self.hits += 1
+            return session
+
+    def peek(self, key: Hashable) -> Optional[UserSession]:
+        """Return a cached session without counting a lookup or refreshing it"""
+        return self._data.get(key)
+
+    def put(self, key: Hashable, session: UserSession):
+        """Store a session, then evict idle and least recently used ones over the limits"""
+        now = time.monotonic()
+        with self._lock:
+            self._remove(key)
+            session.weight = session.measure()
+            self.bytes += session.weight
+            session.touched = now
+            self._data[key] = session
+            self._data.move_to_end(key)
+            self._trim(now)
+
+    def resize(self, key: Hashable):
+        """Re-measure a session after its contents changed"""
+        with self._lock:
+            session = self._data.get(key)
+            if session is None:
+                return
+            weight = session.measure()
+            self.bytes += weight - session.weight
+            session.weight = weight
+            self._trim(time.monotonic())
+
+    def pop(self, key: Hashable) -> Optional[UserSession]:
+        """Drop one user's session"""
+        with self._lock:
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return size, byte usage, hit/miss counters and eviction reasons"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
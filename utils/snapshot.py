@@ -0,0 +1,108 @@
+import json
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+from typing import Iterable, Iterator
+from utils.cache import LRUCache
+from utils.models import Airdrop
+
+# Layout: header | entry table (offset, length) per airdrop | JSON blobs | JSON array of ids
+MAGIC = b"ADSNAP01"
+HEADER = struct.Struct("<8sIQI")
+ENTRY = struct.Struct("<QI")
+
+def write_snapshot(airdrops: Iterable, path: str) -> int:
+    """Write airdrops to a memory-mappable snapshot file atomically; returns the count"""
+    blobs = []
+    ids = []
+    for airdrop in airdrops:
+        data = airdrop.to_dict() if isinstance(airdrop, Airdrop) else airdrop
+        ids.append(data["id"])
+        blobs.append(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+    ids_blob = json.dumps(ids, separators=(',', ':')).encode('utf-8')
+    offset = HEADER.size + ENTRY.size * len(blobs)
+    entries = []
+    for blob in blobs:
+        entries.append(ENTRY.pack(offset, len(blob)))
+        offset += len(blob)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(blobs), offset, len(ids_blob)))
+        f.writelines(entries)
+        f.writelines(blobs)
+        f.write(ids_blob)
+    os.replace(tmp_path, path)
+    return len(blobs)
+
+class CatalogSnapshot:
+    """Read-only, memory-mapped snapshot; processes mapping the same file share its pages"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, ids_offset, ids_length = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        self.ids = json.loads(self._mm[ids_offset:ids_offset + ids_length])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def raw(self, i: int) -> bytes:
+        offset, length = ENTRY.unpack_from(self._mm, HEADER.size + ENTRY.size * i)
+        return self._mm[offset:offset + length]
+
+    def load(self, i: int) -> Airdrop:
+        return Airdrop(json.loads(self.raw(i)))
+
+class SnapshotMapping(Mapping):
+    """id -> Airdrop view over a snapshot that decodes records on demand"""
+
+    def __init__(self, snapshot: CatalogSnapshot, cache_size: int = 1024):
+        self.snapshot = snapshot
+        self._positions = {airdrop_id: i for i, airdrop_id in enumerate(snapshot.ids)}
+        self._cache = LRUCache(cache_size)
+        # Statuses changed after the snapshot was written, reapplied on every decode
+        self._statuses = {}
+
+    def _load(self, i: int, airdrop_id: str) -> Airdrop:
+        airdrop = self.snapshot.load(i)
+        status = self._statuses.get(airdrop_id)
+        if status is not None:
+            airdrop.status = status
+        return airdrop
+
+    def __getitem__(self, airdrop_id: str) -> Airdrop:
+        airdrop = self._cache.get(airdrop_id)
+        if airdrop is None:
+            airdrop = self._load(self._positions[airdrop_id], airdrop_id)
+            self._cache.put(airdrop_id, airdrop)
+        return airdrop
+
+    def set_status(self, airdrop_id: str, status: str):
+        """Override one record's status without rewriting the snapshot"""
+        self._statuses[airdrop_id] = status
+        cached = self._cache.get(airdrop_id)
+        if cached is not None:
+            cached.status = status
+
+    def __contains__(self, airdrop_id) -> bool:
+        return airdrop_id in self._positions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.snapshot.ids)
+
+    def __len__(self) -> int:
+        return len(self.snapshot.ids)
+
+    def items(self):
+        # Stream decoded records without filling the LRU during full scans
+        for i, airdrop_id in enumerate(self.snapshot.ids):
+            yield airdrop_id, self._load(i, airdrop_id)
+
+def load_snapshot_mapping(path: str) -> SnapshotMapping:
+    """Map a snapshot file and return its lazy id -> Airdrop view"""
+    return SnapshotMapping(CatalogSnapshot(path))
@@ -0,0 +1,253 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Set, Tuple
+from config import Config
+from utils.database import DatabaseManager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_drops (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    airdrop_id TEXT NOT NULL,
+    UNIQUE (username, airdrop_id)
+);
+CREATE INDEX IF NOT EXISTS idx_user_drops_airdrop ON user_drops (airdrop_id);
+
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    airdrop_id TEXT NOT NULL,
+    remind_time TEXT NOT NULL,
+    frequency TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    reminder_id TEXT,
+    due_at REAL,
+    chat_id INTEGER,
+    status TEXT NOT NULL DEFAULT 'pending'
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_user ON reminders (username);
+CREATE INDEX IF NOT EXISTS idx_reminders_airdrop ON reminders (airdrop_id);
+
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    chat_id INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Columns added after the first release, applied to older database files
+REMINDER_COLUMNS = {
+    "reminder_id": "TEXT",
+    "due_at": "REAL",
+    "chat_id": "INTEGER",
+    "status": "TEXT NOT NULL DEFAULT 'pending'"
+}
+
+PENDING_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders (status, due_at) "
+    "WHERE due_at IS NOT NULL"
+)
+
+# Fixed statement texts so sqlite3's statement cache reuses the prepared plans
+SELECT_USER_DROPS = "SELECT airdrop_id FROM user_drops WHERE username = ? ORDER BY seq"
+INSERT_USER_DROP = "INSERT OR IGNORE INTO user_drops (username, airdrop_id) VALUES (?, ?)"
+DELETE_USER_DROP = "DELETE FROM user_drops WHERE username = ? AND airdrop_id = ?"
+DELETE_ALL_USER_DROPS = "DELETE FROM user_drops WHERE username = ?"
+SELECT_REMINDERS = (
+    "SELECT reminder_id, airdrop_id, remind_time, frequency, created_at, due_at, chat_id, status "
+    "FROM reminders WHERE username = ? ORDER BY id"
+)
+INSERT_REMINDER = (
+    "INSERT INTO reminders (username, airdrop_id, remind_time, frequency, created_at, "
+    "reminder_id, due_at, chat_id, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SELECT_PENDING_REMINDERS = (
+    "SELECT username, reminder_id, airdrop_id, remind_time, frequency, created_at, due_at, chat_id, status "
+    "FROM reminders WHERE status = 'pending' AND due_at IS NOT NULL"
+)
+MARK_REMINDER_SENT = "UPDATE reminders SET status = 'sent' WHERE username = ? AND reminder_id = ?"
+
+UPSERT_USER = (
+    "INSERT INTO users (username, chat_id) VALUES (?, ?) "
+    "ON CONFLICT (username) DO UPDATE SET chat_id = excluded.chat_id"
+)
+SELECT_USERS = "SELECT username, chat_id FROM users"
+
+# SQLite's default limit on bound parameters per statement is 999
+IN_CHUNK_SIZE = 500
+
+REMINDER_FIELDS = ("id", "airdrop_id", "remind_time", "frequency", "created_at", "due_at", "chat_id", "status")
+
+class SQLiteDatabaseManager(DatabaseManager):
+    """DatabaseManager that keeps wishlists and reminders in a single SQLite file"""
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or Config.SQLITE_PATH
+        self._local = threading.local()
+        super().__init__()
+
+    def ensure_files(self):
+        """Create the sample catalog and the schema, migrating older databases"""
+        super().ensure_files()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(reminders)")}
+            for column, decl in REMINDER_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE reminders ADD COLUMN {column} {decl}")
+            conn.execute(PENDING_INDEX)
+
+    def open_journal(self):
+        """SQLite keeps its own write-ahead log"""
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def load_user_drops(self, username: str) -> List[str]:
+        """Load user's saved airdrops"""
+        rows = self._connect().execute(SELECT_USER_DROPS, (username,)).fetchall()
+        return [row[0] for row in rows]
+
+    def write_user_drops(self, username: str, user_drops: List[str]):
+        """Replace user's saved airdrops in one transaction"""
+        with self._connect() as conn:
+            conn.execute(DELETE_ALL_USER_DROPS, (username,))
+            conn.executemany(INSERT_USER_DROP, [(username, airdrop_id) for airdrop_id in user_drops])
+
+    def save_user_drop(self, username: str, airdrop_id: str):
+        """Save airdrop to user's list"""
+        with self._connect() as conn:
+            conn.execute(INSERT_USER_DROP, (username, airdrop_id))
+
+    def remove_user_drop(self, username: str, airdrop_id: str):
+        """Remove airdrop from user's list"""
+        with self._connect() as conn:
+            conn.execute(DELETE_USER_DROP, (username, airdrop_id))
+
+    def load_user_reminders(self, username: str) -> List[Dict]:
+        """Load user's reminders"""
+        rows = self._connect().execute(SELECT_REMINDERS, (username,)).fetchall()
+        return [dict(zip(REMINDER_FIELDS, row)) for row in rows]
+
+    def save_user_reminder(self, username: str, airdrop_id: str, remind_time: str, frequency: str,
+                           due_at: float = None, chat_id: int = None) -> Dict:
+        """Save user reminder"""
+        reminder = {
+            "id": uuid.uuid4().hex,
+            "airdrop_id": airdrop_id,
+            "remind_time": remind_time,
+            "frequency": frequency,
+            "created_at": str(datetime.now()),
+            "due_at": due_at,
+            "chat_id": chat_id,
+            "status": "pending"
+        }
+        with self._connect() as conn:
+            conn.execute(INSERT_REMINDER, (
+                username, airdrop_id, remind_time, frequency, reminder["created_at"],
+                reminder["id"], due_at, chat_id, reminder["status"]
+            ))
+        return reminder
+
+    def load_pending_reminders(self) -> List[Dict]:
+        """Load every undelivered reminder via the (status, due_at) index"""
+        rows = self._connect().execute(SELECT_PENDING_REMINDERS).fetchall()
+        return [dict(zip(REMINDER_FIELDS, row[1:]), username=row[0]) for row in rows]
+
+    def mark_reminder_delivered(self, username: str, reminder_id: str):
+        """Flag a reminder as sent"""
+        with self._connect() as conn:
+            conn.execute(MARK_REMINDER_SENT, (username, reminder_id))
+
+    def _load_user_registry(self) -> Dict[str, int]:
+        """Cache the users table in memory to skip redundant upserts"""
+        if self._users is None:
+            self._users = dict(self._connect().execute(SELECT_USERS).fetchall())
+        return self._users
+
+    def register_user(self, username: str, chat_id: int) -> bool:
+        """Record the chat a user can be messaged in; returns True if it changed"""
+        with self._users_lock:
+            users = self._load_user_registry()
+            if users.get(username) == chat_id:
+                return False
+            with self._connect() as conn:
+                conn.execute(UPSERT_USER, (username, chat_id))
+            users[username] = chat_id
+        return True
+
+    def list_users(self) -> List[Tuple[str, int]]:
+        """Every known (username, chat_id)"""
+        return self._connect().execute(SELECT_USERS).fetchall()
+
+    def users_with_drops(self, airdrop_ids: Iterable[str]) -> Set[str]:
+        """Usernames whose wishlist contains any of the given airdrops, via the airdrop_id index"""
+        airdrop_ids = list(airdrop_ids)
+        usernames = set()
+        conn = self._connect()
+        for i in range(0, len(airdrop_ids), IN_CHUNK_SIZE):
+            chunk = airdrop_ids[i:i + IN_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT DISTINCT username FROM user_drops WHERE airdrop_id IN ({placeholders})", chunk
+            )
+            usernames.update(row[0] for row in rows)
+        return usernames
+
+    def import_json_directories(self, user_drops_dir: str = None, reminders_dir: str = None) -> Dict[str, int]:
+        """Bulk-import the per-user JSON files into SQLite in one transaction"""
+        user_drops_dir = user_drops_dir or Config.USER_DROPS_DIR
+        reminders_dir = reminders_dir or Config.REMINDERS_DIR
+        counts = {"users": 0, "drops": 0, "reminders": 0, "skipped_files": 0}
+
+        def iter_json(directory: str, suffix: str):
+            if not os.path.isdir(directory):
+                return
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(suffix):
+                        continue
+                    try:
+                        with open(entry.path, 'r') as f:
+                            yield entry.name[:-len(suffix)], json.load(f)
+                    except (OSError, ValueError):
+                        counts["skipped_files"] += 1
+
+        def drop_rows():
+            for username, data in iter_json(user_drops_dir, ".json"):
+                counts["users"] += 1
+                for airdrop_id in data.get("airdrops", []):
+                    counts["drops"] += 1
+                    yield (username, airdrop_id)
+
+        def reminder_rows():
+            for username, data in iter_json(reminders_dir, "_reminders.json"):
+                for reminder in data.get("reminders", []):
+                    counts["reminders"] += 1
+                    yield (
+                        username,
+                        reminder["airdrop_id"],
+                        reminder.get("remind_time", ""),
+                        reminder.get("frequency", "once"),
+                        reminder.get("created_at", str(datetime.now())),
+                        reminder.get("id") or uuid.uuid4().hex,
+                        reminder.get("due_at"),
+                        reminder.get("chat_id"),
+                        reminder.get("status", "pending")
+                    )
+
+        with self._connect() as conn:
+            conn.executemany(INSERT_USER_DROP, drop_rows())
+            conn.executemany(INSERT_REMINDER, reminder_rows())
+        return counts
@@ -0,0 +1,287 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Statuses the engine owns; 'active' and 'hot' come from the catalog file
+DERIVED_STATUSES = ('ending_soon', 'expired')
+
+def _day_start(day: date) -> float:
+    """Local midnight at the start of day, as a timestamp"""
+    return datetime.combine(day, datetime.min.time()).timestamp()
+
+def derive_status(raw_status: str, end_date: str, now: float,
+                  ending_soon_days: int) -> Tuple[str, List[Tuple[float, str]]]:
+    """Return an airdrop's status at now and its future (when, status) transitions
+
+    An airdrop is ending_soon from midnight ending_soon_days before its
+    end_date and expired from the midnight after it. A file status of
+    'expired' is final.
+    """
+    if raw_status == 'expired':
+        return raw_status, []
+    try:
+        end_day = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return raw_status, []
+
+    soon_at = _day_start(end_day - timedelta(days=ending_soon_days))
+    expired_at = _day_start(end_day + timedelta(days=1))
+    if now >= expired_at:
+        return 'expired', []
+    if now >= soon_at:
+        return 'ending_soon', [(expired_at, 'expired')]
+    return raw_status, [(soon_at, 'ending_soon'), (expired_at, 'expired')]
+
+class StatusEngine:
+    """Derives ending_soon/expired from end dates and flips them when deadlines pass
+
+    Future transitions sit in a heap ordered by deadline; a single task sleeps
+    until the earliest one. Catalog reloads only re-derive the airdrops in the
+    CatalogChange. The derived statuses and the heap are saved so a restart
+    against the same catalog file resumes without re-deriving every airdrop.
+    """
+
+    def __init__(self, catalog, state_path: str = None, ending_soon_days: int = None):
+        self.catalog = catalog
+        self.state_path = state_path or Config.STATUS_STATE_FILE
+        self.ending_soon_days = Config.ENDING_SOON_DAYS if ending_soon_days is None else ending_soon_days
+        # (when, seq, airdrop_id, status, generation)
+        self._heap = []
+        self._seq = itertools.count()
+        self._generation = {}
+        # airdrop_id -> (file status, derived status) for airdrops the engine changed
+        self._derived = {}
+        self._subscribers = []
+        self._wakeup = None
+        self._task = None
+        self._loop = None
+        self._save_lock = threading.Lock()
+        self.transitions = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def subscribe(self, callback: Callable[[List[Tuple[str, str, str]]], None]):
+        """Call callback([(airdrop_id, old_status, new_status), ...]) after each batch of transitions"""
+        self._subscribers.append(callback)
+
+    def status_of(self, airdrop_id: str) -> Optional[str]:
+        airdrop = self.catalog.get(airdrop_id)
+        return airdrop.get('status') if airdrop else None
+
+    def _set(self, airdrop_id: str, raw_status: str, status: str) -> Optional[Tuple[str, str, str]]:
+        if status == raw_status:
+            self._derived.pop(airdrop_id, None)
+        else:
+            self._derived[airdrop_id] = (raw_status, status)
+        old_status = self.catalog.set_status(airdrop_id, status)
+        if old_status is None or old_status == status:
+            return None
+        return airdrop_id, old_status, status
+
+    def track(self, airdrop_id: str, airdrop, now: float = None) -> Optional[Tuple[str, str, str]]:
+        """(Re)derive one airdrop's status and schedule its transitions"""
+        now = time.time() if now is None else now
+        generation = self._generation.get(airdrop_id, 0) + 1
+        self._generation[airdrop_id] = generation
+
+        raw_status = airdrop.get('status')
+        status, upcoming = derive_status(raw_status, airdrop.get('end_date'), now, self.ending_soon_days)
+        for when, next_status in upcoming:
+            heapq.heappush(self._heap, (when, next(self._seq), airdrop_id, next_status, generation))
+        return self._set(airdrop_id, raw_status, status)
+
+    def untrack(self, airdrop_id: str):
+        # Bumping the generation cancels its heap entries lazily
+        self._generation[airdrop_id] = self._generation.get(airdrop_id, 0) + 1
+        self._derived.pop(airdrop_id, None)
+
+    def rebuild(self, now: float = None) -> List[Tuple[str, str, str]]:
+        """Derive every airdrop from scratch"""
+        now = time.time() if now is None else now
+        self._heap = []
+        self._generation = {}
+        self._derived = {}
+        changed = []
+        for airdrop_id, airdrop in list(self.catalog.items()):
+            transition = self.track(airdrop_id, airdrop, now)
+            if transition:
+                changed.append(transition)
+        return changed
+
+    def _on_reload(self, change):
+        # Catalog subscriber; without a watcher, reloads happen on whichever thread calls refresh()
+        self._loop.call_soon_threadsafe(self.on_catalog_change, change)
+
+    def on_catalog_change(self, change):
+        """Re-derive only what a reload touched (call on the event loop)"""
+        for airdrop_id in change.removed:
+            self.untrack(airdrop_id)
+        now = time.time()
+        changed = []
+        for airdrop_id in change.added + change.changed:
+            airdrop = self.catalog.get(airdrop_id)
+            if airdrop is not None:
+                transition = self.track(airdrop_id, airdrop, now)
+                if transition:
+                    changed.append(transition)
+        if change.added or change.changed or change.removed:
+            self._notify(changed)
+            self._schedule_save()
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def pop_due(self, now: float = None) -> List[Tuple[str, str, str]]:
+        """Apply every transition whose deadline has passed"""
+        now = time.time() if now is None else now
+        changed = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, airdrop_id, status, generation = heapq.heappop(self._heap)
+            if self._generation.get(airdrop_id) != generation:
+                continue
+            airdrop = self.catalog.get(airdrop_id)
+            if airdrop is None:
+                continue
+            raw_status = self._derived.get(airdrop_id, (airdrop.get('status'),))[0]
+            transition = self._set(airdrop_id, raw_status, status)
+            if transition:
+                changed.append(transition)
+        return changed
+
+    def next_due(self) -> Optional[float]:
+        while self._heap and self._generation.get(self._heap[0][2]) != self._heap[0][4]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def _notify(self, changed: List[Tuple[str, str, str]]):
+        if not changed:
+            return
+        self.transitions += len(changed)
+        for callback in list(self._subscribers):
+            try:
+                callback(changed)
+            except Exception:
+                logger.exception(f"Status subscriber {callback!r} failed")
+
+    def snapshot(self) -> dict:
+        """Copy of the state to persist; take it on the thread that mutates the engine"""
+        return {
+            "stamp": list(self.catalog.stamp) if self.catalog.stamp else None,
+            "ending_soon_days": self.ending_soon_days,
+            "saved_at": time.time(),
+            "derived": dict(self._derived),
+            "heap": [
+                [when, airdrop_id, status] for when, _, airdrop_id, status, generation in self._heap
+                if self._generation.get(airdrop_id) == generation
+            ]
+        }
+
+    def save(self, state: dict = None):
+        """Persist derived statuses and pending transitions for the current catalog file"""
+        state = state or self.snapshot()
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._save_lock:
+            # Workers sharing a state file must not share a temp file; _save_lock covers this process
+            tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f, separators=(',', ':'))
+            os.replace(tmp_path, self.state_path)
+
+    def restore(self) -> bool:
+        """Load saved state if it was written for the catalog file now loaded"""
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable status state {self.state_path}: {e}")
+            return False
+
+        stamp = self.catalog.stamp
+        if state.get("stamp") != (list(stamp) if stamp else None) or \
+                state.get("ending_soon_days") != self.ending_soon_days:
+            return False
+
+        self._heap = []
+        self._generation = {}
+        self._derived = {}
+        for airdrop_id, (raw_status, status) in state.get("derived", {}).items():
+            self._set(airdrop_id, raw_status, status)
+        for when, airdrop_id, status in state.get("heap", []):
+            generation = self._generation.setdefault(airdrop_id, 1)
+            self._heap.append((when, next(self._seq), airdrop_id, status, generation))
+        heapq.heapify(self._heap)
+        return True
+
+    def _schedule_save(self):
+        if self._task is None:
+            return
+        asyncio.get_running_loop().run_in_executor(None, self._save_logged, self.snapshot())
+
+    def _save_logged(self, state: dict):
+        try:
+            self.save(state)
+        except OSError as e:
+            logger.warning(f"Could not save status state: {e}")
+
+    async def _run(self):
+        while True:
+            changed = self.pop_due()
+            if changed:
+                self._notify(changed)
+                self._schedule_save()
+            due = self.next_due()
+            timeout = None if due is None else max(0.0, due - time.time())
+            # Wall-clock deadlines: wake at least hourly in case the clock jumped
+            timeout = Config.STATUS_MAX_SLEEP if timeout is None else min(timeout, Config.STATUS_MAX_SLEEP)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Derive or restore statuses, then follow deadlines and catalog reloads (call on the event loop)"""
+        if self._task is not None:
+            return
+        self.catalog.refresh()
+        started = time.perf_counter()
+        if self.restore():
+            changed = self.pop_due()
+            logger.info(f"Status engine restored {len(self._derived)} derived statuses "
+                        f"in {time.perf_counter() - started:.3f}s")
+        else:
+            changed = self.rebuild()
+            logger.info(f"Status engine derived {len(self._derived)} statuses "
+                        f"in {time.perf_counter() - started:.3f}s")
+        self._notify(changed)
+        self._loop = asyncio.get_running_loop()
+        self.catalog.subscribe(self._on_reload)
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+        self._schedule_save()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self.catalog.unsubscribe(self._on_reload)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.get_running_loop().run_in_executor(None, self._save_logged, self.snapshot())
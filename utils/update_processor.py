@@ -0,0 +1,46 @@
+import asyncio
+import contextlib
+from typing import Awaitable, Hashable
+from telegram.ext import BaseUpdateProcessor
+
+class UserOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Process updates concurrently across users but strictly in order per user
+
+    Button presses skip the queue so navigation is answered at once; the bot
+    takes user_lock itself around presses that change user data.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}
+
+    @contextlib.asynccontextmanager
+    async def user_lock(self, user_id: Hashable):
+        """Hold the lock that orders user_id's updates"""
+        # [lock, number of holders and waiters]
+        entry = self._locks.get(user_id)
+        if entry is None:
+            entry = self._locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user_id]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        user = getattr(update, "effective_user", None)
+        if user is None or getattr(update, "callback_query", None) is not None:
+            # Presses are ordered per message by CallbackCoalescer; actions also take user_lock
+            await coroutine
+            return
+        async with self.user_lock(user.id):
+            await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,147 @@
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+class Inotify:
+    """Minimal ctypes binding that reports events for one file, by watching its directory
+
+    Watching the directory rather than the file keeps working when the file is
+    replaced with os.replace, which is how editors and our own writers save it.
+    """
+
+    def __init__(self, path: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.filename = os.path.basename(path)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory = os.path.dirname(os.path.abspath(path))
+        if libc.inotify_add_watch(self.fd, directory.encode(), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout: float) -> bool:
+        """Block up to timeout seconds; True if the watched file was touched"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        touched = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buffer):
+            _, _, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            if name == self.filename:
+                touched = True
+        return touched
+
+    def close(self):
+        os.close(self.fd)
+
+class CatalogWatcher:
+    """Reloads an AirdropCatalog in the background when its file changes
+
+    Parsing and diffing happen on the watcher thread. With an event loop, the
+    swap and the change events run on that loop, so handlers never observe a
+    half-applied reload. A malformed file is logged and skipped; the last good
+    catalog stays in place.
+    """
+
+    def __init__(self, catalog, loop: Optional[asyncio.AbstractEventLoop] = None,
+                 debounce: float = None, poll_interval: float = None):
+        self.catalog = catalog
+        self.loop = loop
+        self.debounce = Config.CATALOG_RELOAD_DEBOUNCE if debounce is None else debounce
+        self.poll_interval = poll_interval or Config.CATALOG_CHECK_INTERVAL
+        self.mode = None
+        self.reloads = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.catalog.refresh()
+        self.catalog.watching = True
+        self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.catalog.watching = False
+
+    def _run(self):
+        inotify = None
+        if sys.platform.startswith("linux"):
+            try:
+                inotify = Inotify(self.catalog.path)
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify unavailable ({e}), polling {self.catalog.path}")
+        self.mode = "inotify" if inotify else "poll"
+
+        rescan_at = time.monotonic() + Config.CATALOG_WATCH_RESCAN_INTERVAL
+        try:
+            while not self._stop.is_set():
+                if inotify:
+                    # Short waits so stop() is prompt; the periodic rescan covers
+                    # filesystems that do not deliver inotify events
+                    if inotify.wait(self.poll_interval):
+                        # Let a burst of writes settle before parsing
+                        while inotify.wait(self.debounce):
+                            pass
+                    elif time.monotonic() < rescan_at:
+                        continue
+                    rescan_at = time.monotonic() + Config.CATALOG_WATCH_RESCAN_INTERVAL
+                else:
+                    self._stop.wait(self.poll_interval)
+                try:
+                    self.check()
+                except Exception:
+                    logger.exception("Catalog reload failed")
+        finally:
+            if inotify:
+                inotify.close()
+
+    def check(self) -> bool:
+        """Reload if the file changed; True if a new catalog was handed over"""
+        pending = self.catalog.prepare_reload()
+        if pending is None:
+            return False
+        if self.loop is not None and self.loop.is_running():
+            async def apply():
+                return self.catalog.apply(*pending)
+            # Wait for the swap so the next check compares against the new stamp
+            asyncio.run_coroutine_threadsafe(apply(), self.loop).result()
+        else:
+            self.catalog.apply(*pending)
+        self.reloads += 1
+        return True